@@ -0,0 +1,244 @@
+"""Alerting on scored samples and sensor readings.
+
+The engine keeps a small state per (site, analyte) and evaluates each new
+batch of readings incrementally. Hysteresis and debouncing stop readings
+that hover around a threshold from flapping:
+
+* an alert level is entered when the concentration reaches the threshold
+  for ``raise_after`` consecutive readings;
+* it is only left once the concentration has dropped below the threshold
+  less the ``hysteresis`` fraction for ``clear_after`` consecutive readings.
+
+Each level keeps its own consecutive count, and a reading at the escalation
+level also counts toward the action level, so readings alternating between
+the two still raise an action alert.
+
+All three settings can be overridden per analyte, e.g.
+``{"Chloride (Cl-)": {"hysteresis": 0.2, "clear_after": 5}}``.
+
+Alerts are dicts passed to pluggable sinks. A sink is any callable taking
+one alert. Sinks run on a background thread, so a slow webhook does not
+hold up scoring.
+"""
+import json
+import queue
+import sys
+import threading
+import urllib.request
+from datetime import datetime, timezone
+
+import numpy as np
+
+from thresholds import STATUS_ORDER, canonical_analyte, classify_frame
+
+DEFAULT_HYSTERESIS = 0.1
+DEFAULT_RAISE_AFTER = 1
+DEFAULT_CLEAR_AFTER = 3
+SETTINGS = ("hysteresis", "raise_after", "clear_after")
+
+ALERT_MESSAGES = {
+    "escalation": "CRITICAL: {analyte} at {site} reached the escalation level ({concentration:.4g} mg/L). Production should be stopped.",
+    "action": "CAUTION: {analyte} at {site} reached the action level ({concentration:.4g} mg/L).",
+    "action_from_escalation": "CAUTION: {analyte} at {site} dropped back to the action level ({concentration:.4g} mg/L).",
+    "safe": "CLEARED: {analyte} at {site} is back within safe limits ({concentration:.4g} mg/L)."
+}
+
+
+class StdoutSink:
+    """Write alerts to standard output, one line each."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def __call__(self, alert):
+        print(f"[{alert['timestamp']}] {alert['message']}", file=self.stream, flush=True)
+
+
+class FileSink:
+    """Append alerts to a JSON lines file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, alert):
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(alert) + "\n")
+
+
+class WebhookSink:
+    """POST alerts as JSON to a (local) webhook URL."""
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, alert):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(alert).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class AlertEngine:
+    """Incremental alert evaluation with per-analyte hysteresis and debouncing."""
+
+    def __init__(self, sinks=None, hysteresis=DEFAULT_HYSTERESIS,
+                 raise_after=DEFAULT_RAISE_AFTER, clear_after=DEFAULT_CLEAR_AFTER,
+                 overrides=None, background=True):
+        self.sinks = list(sinks) if sinks is not None else [StdoutSink()]
+        self.hysteresis = hysteresis
+        self.raise_after = raise_after
+        self.clear_after = clear_after
+        self.overrides = {}
+        for analyte, settings in (overrides or {}).items():
+            unknown = set(settings) - set(SETTINGS)
+            if unknown:
+                raise ValueError(f"unknown alert setting(s) for {analyte}: {', '.join(sorted(unknown))}")
+            self.overrides[canonical_analyte(analyte)] = dict(settings)
+        # (site, analyte) -> [level, consecutive readings supporting each level]
+        self._state = {}
+        self._lock = threading.Lock()
+        self._queue = None
+        if background:
+            self._queue = queue.Queue()
+            threading.Thread(target=self._deliver_queued, name="alert-sinks", daemon=True).start()
+
+    def settings(self, analyte):
+        """Return the (hysteresis, raise_after, clear_after) used for an analyte."""
+        override = self.overrides.get(canonical_analyte(analyte), {})
+        return (
+            override.get("hysteresis", self.hysteresis),
+            override.get("raise_after", self.raise_after),
+            override.get("clear_after", self.clear_after)
+        )
+
+    def level(self, site, analyte):
+        """Return the current alert level name for a site and analyte."""
+        state = self._state.get((site, analyte))
+        return STATUS_ORDER[state[0]] if state else "safe"
+
+    def evaluate(self, readings):
+        """Evaluate a batch of readings in order and dispatch any alerts.
+
+        ``readings`` is a DataFrame with ``site``, ``analyte`` and
+        ``concentration`` columns. ``action_level`` and ``escalation_level``
+        are used when present, otherwise they are looked up from the
+        thresholds at each row's ``ph``. An optional ``timestamp`` column is
+        copied onto the alerts. Returns the list of alerts raised.
+        """
+        if readings.empty:
+            return []
+
+        if "action_level" in readings and "escalation_level" in readings:
+            action = readings["action_level"].to_numpy(dtype=float)
+            escalation = readings["escalation_level"].to_numpy(dtype=float)
+        else:
+            classified = classify_frame(readings)
+            action = classified["action_level"].to_numpy()
+            escalation = classified["escalation_level"].to_numpy()
+
+        # Settings resolved once per distinct analyte
+        analytes = readings["analyte"].astype("category")
+        settings = np.array(
+            [self.settings(str(name)) for name in analytes.cat.categories] + [self.settings("")],
+            dtype=float
+        ).reshape(-1, 3)[analytes.cat.codes.to_numpy()]
+        raise_after = settings[:, 1].astype(int)
+        clear_after = settings[:, 2].astype(int)
+
+        concentration = readings["concentration"].to_numpy(dtype=float)
+        # Level reached on the way up, and level held on the way down
+        rising = (concentration >= action).astype(np.int8) + (concentration >= escalation)
+        release = 1 - settings[:, 0]
+        holding = (concentration >= action * release).astype(np.int8) + (concentration >= escalation * release)
+
+        if "timestamp" in readings:
+            timestamps = readings["timestamp"].astype(str).tolist()
+        else:
+            timestamps = [datetime.now(timezone.utc).isoformat(timespec="seconds")] * len(readings)
+
+        alerts = []
+        with self._lock:
+            for i, key in enumerate(zip(readings["site"], readings["analyte"])):
+                if np.isnan(action[i]):
+                    continue
+                state = self._state.setdefault(key, [0, [0, 0, 0]])
+                current, counts = state
+                # Levels above the current one count readings reaching them,
+                # levels below count readings held under them
+                for candidate in range(len(counts)):
+                    if candidate > current:
+                        supported = rising[i] >= candidate
+                    elif candidate < current:
+                        supported = holding[i] <= candidate
+                    else:
+                        supported = False
+                    counts[candidate] = counts[candidate] + 1 if supported else 0
+
+                # Raise to the highest level, or clear to the lowest, whose count is reached
+                raised = [level for level in range(current + 1, len(counts)) if counts[level] >= raise_after[i]]
+                cleared = [level for level in range(current) if counts[level] >= clear_after[i]]
+                if raised:
+                    target = raised[-1]
+                elif cleared:
+                    target = cleared[0]
+                else:
+                    continue
+
+                # Counts between the old and new level switch direction, so start over
+                state[0] = target
+                for passed in range(min(current, target), max(current, target) + 1):
+                    counts[passed] = 0
+                level = STATUS_ORDER[target]
+                message_key = "action_from_escalation" if level == "action" and current == 2 else level
+                site, analyte = key
+                alerts.append({
+                    "site": site,
+                    "analyte": analyte,
+                    "level": level,
+                    "previous_level": STATUS_ORDER[current],
+                    "concentration": float(concentration[i]),
+                    "action_level": float(action[i]),
+                    "escalation_level": float(escalation[i]),
+                    "timestamp": timestamps[i],
+                    "message": ALERT_MESSAGES[message_key].format(
+                        analyte=analyte, site=site, concentration=concentration[i]
+                    )
+                })
+
+        for alert in alerts:
+            self.dispatch(alert)
+        return alerts
+
+    def dispatch(self, alert):
+        """Queue an alert for the sinks, or deliver it now without a background thread."""
+        if self._queue is None:
+            self._deliver(alert)
+        else:
+            self._queue.put(alert)
+
+    def flush(self):
+        """Block until every queued alert has been delivered."""
+        if self._queue is not None:
+            self._queue.join()
+
+    def _deliver_queued(self):
+        while True:
+            alert = self._queue.get()
+            try:
+                self._deliver(alert)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, alert):
+        """Send an alert to every sink; a failing sink does not block the others."""
+        for sink in self.sinks:
+            try:
+                sink(alert)
+            except Exception as e:
+                print(f"Alert sink {sink!r} failed: {e}", file=sys.stderr)
@@ -0,0 +1,113 @@
+"""Robust per-site anomaly detection for incoming analyte readings.
+
+Readings are compared against the recent history for the same site and
+analyte using a median/MAD (modified z-score) test on log10 concentrations,
+so a sudden jump or an impossible value is flagged even when it is still
+below the action level.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Modified z-score constant (Iglewicz & Hoaglin): 0.6745 * (x - median) / MAD
+MAD_SCALE = 0.6745
+DEFAULT_THRESHOLD = 3.5
+DEFAULT_WINDOW = 50
+DEFAULT_MIN_HISTORY = 5
+# Lower bound on the MAD in log10 units, so a site with perfectly repeated
+# readings does not flag every small change as an anomaly.
+MIN_MAD = 0.01
+
+KEY_COLUMNS = ["site", "analyte"]
+
+
+class RobustAnomalyDetector:
+    """Streaming median/MAD detector keyed by (site, analyte).
+
+    Each key keeps a rolling window of its most recent log10 concentrations
+    together with the cached median and MAD of that window. Scoring a batch
+    is a single vectorized lookup against the cached statistics, and updating
+    only recomputes statistics for the keys present in the batch, so each
+    batch costs O(batch) for a fixed window size. One detector is shared by
+    every app session, so scoring and updating are serialized by a lock.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, threshold=DEFAULT_THRESHOLD, min_history=DEFAULT_MIN_HISTORY):
+        self.window = window
+        self.threshold = threshold
+        self.min_history = min_history
+        self._history = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def score(self, batch):
+        """Score a batch of readings against the stored history.
+
+        ``batch`` is a DataFrame with ``site``, ``analyte`` and
+        ``concentration`` columns. Returns a DataFrame aligned to ``batch``
+        with ``robust_z``, ``anomaly`` and ``anomaly_reason`` columns.
+        """
+        with self._lock:
+            return self._score(batch)
+
+    def _score(self, batch):
+        concentration = batch["concentration"].to_numpy(dtype=float)
+        keys = list(zip(batch["site"], batch["analyte"]))
+
+        stats = np.array(
+            [self._stats.get(key, (np.nan, np.nan, 0)) for key in keys],
+            dtype=float
+        ).reshape(len(keys), 3)
+        median, mad, count = stats[:, 0], stats[:, 1], stats[:, 2]
+
+        positive = concentration > 0
+        log_conc = np.log10(np.where(positive, concentration, np.nan))
+        robust_z = MAD_SCALE * (log_conc - median) / mad
+        robust_z[count < self.min_history] = np.nan
+
+        reason = np.select(
+            [~positive, robust_z > self.threshold, robust_z < -self.threshold],
+            ["Non-positive concentration", "Unusually high for this site", "Unusually low for this site"],
+            default=""
+        )
+
+        return pd.DataFrame({
+            "robust_z": robust_z,
+            "anomaly": reason != "",
+            "anomaly_reason": np.where(reason != "", reason, None)
+        }, index=batch.index)
+
+    def update(self, batch):
+        """Add a batch of readings to the per-key history windows."""
+        with self._lock:
+            self._update(batch)
+
+    def _update(self, batch):
+        positive = batch[batch["concentration"] > 0]
+        if positive.empty:
+            return
+
+        log_conc = np.log10(positive["concentration"].to_numpy(dtype=float))
+        grouped = pd.Series(log_conc, index=positive.index).groupby(
+            [positive["site"], positive["analyte"]], sort=False
+        )
+        for key, values in grouped:
+            history = self._history.get(key)
+            if history is not None:
+                values = np.concatenate([history, values.to_numpy()])
+            else:
+                values = values.to_numpy()
+            values = values[-self.window:]
+            self._history[key] = values
+
+            median = np.median(values)
+            mad = max(np.median(np.abs(values - median)), MIN_MAD)
+            self._stats[key] = (median, mad, len(values))
+
+    def observe(self, batch):
+        """Score a batch, then fold it into the history, as one atomic step."""
+        with self._lock:
+            scores = self._score(batch)
+            self._update(batch)
+        return scores
@@ -1,19 +1,38 @@
+import json
+import os
+
+from startup_profile import APP_PROFILE
+
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-
-# HydroStar Brand Colors
-PRIMARY_GREEN = "#a7d730"
-SECONDARY_GREEN = "#499823"
-DARK_GREY = "#30343c"
-LIGHT_GREY = "#8c919a"
-PLOT_BG = "#f2f4f7"
-TEXT_BLACK = "#000000"
-
-# Status colors
-STATUS_GREEN = "#4CAF50"
-STATUS_ORANGE = "#FF9800"
-STATUS_RED = "#F44336"
+
+# pandas, plotly and the analysis modules are imported where they are first
+# used, so the page renders before they load
+from sample_index import SampleIndex, sample_hash, threshold_version
+from theme import DARK_GREY, LIGHT_GREY, PRIMARY_GREEN, SECONDARY_GREEN, STATUS_GREEN, STATUS_ORANGE, STATUS_RED
+from thresholds import (
+    ALKALINE_PH_MIN, DEFAULT_PH, NEUTRAL_PH_MAX, alkaline_weight, build_result, regime,
+    thresholds_for_ph
+)
+
+APP_PROFILE.mark("import app modules")
+
+# Persistent index of analyzed samples, keyed by content hash
+SAMPLE_INDEX_PATH = os.environ.get("HYDROSTAR_SAMPLE_INDEX", "sample_index.jsonl")
+
+# Optional alert sinks; alerts always go to stdout
+ALERT_FILE = os.environ.get("HYDROSTAR_ALERT_FILE")
+ALERT_WEBHOOK_URL = os.environ.get("HYDROSTAR_ALERT_WEBHOOK")
+# Optional JSON file of per-analyte hysteresis/raise_after/clear_after overrides
+ALERT_SETTINGS = os.environ.get("HYDROSTAR_ALERT_SETTINGS")
+
+# Optional Parquet archive of scored results for long-term compliance records
+ARCHIVE_DIR = os.environ.get("HYDROSTAR_ARCHIVE_DIR")
+
+# Print and show the startup-time breakdown of the first run
+PROFILE_STARTUP = bool(os.environ.get("HYDROSTAR_PROFILE_STARTUP"))
+
+# Show the serialized size of each chart under it
+SHOW_CHART_PAYLOAD = bool(os.environ.get("HYDROSTAR_CHART_PAYLOAD"))
 
 # Page configuration
 st.set_page_config(
@@ -165,442 +184,275 @@ st.markdown(f"""
 </style>
 """, unsafe_allow_html=True)
 
-# Hardcoded data from Electrolyser_Wastewater_Action_Levels.xlsx
-ALKALINE_DATA = {
-    "Chloride (Cl-)": {
-        "action_level": 10.0,
-        "escalation_level": 50.0,
-        "why_it_matters": "Anodic Cl2/ClO-/ClO3- formation competes with OER.",
-        "citation": "CER well-documented; more competitive under alkaline on MMO anodes (Ru/Ir oxides). (Chen et al., 2021, Electrochim. Acta)"
-    },
-    "Sulphide (S2-/HS-)": {
-        "action_level": 0.05,
-        "escalation_level": 0.5,
-        "why_it_matters": "Oxidizes to S0/polysulfides; electrode poisoning.",
-        "citation": "Rapid anodic oxidation and catalyst fouling. (Mollah et al., 2004, J. Hazard. Mater.)"
-    },
-    "Cyanide (CN-)": {
-        "action_level": 0.01,
-        "escalation_level": 0.05,
-        "why_it_matters": "Oxidized; with Cl- forms CNCl (toxic).",
-        "citation": "CN oxidation and CNCl formation in Cl- media reported. (Zhou et al., 2012, Electrochim. Acta)"
-    },
-    "Nitrate (NO3- as N)": {
-        "action_level": 5.0,
-        "escalation_level": 20.0,
-        "why_it_matters": "Competes with HER at cathode - NOx/NH3.",
-        "citation": "Nitrate readily reduced; competes with HER. (Rosca et al., 2009, Chem. Rev.)"
-    },
-    "Nitrite (NO2- as N)": {
-        "action_level": 0.1,
-        "escalation_level": 1.0,
-        "why_it_matters": "Cathodic reduction to NO/N2O/NH3.",
-        "citation": "Nitrite reduced at low conc; side-reactions documented. (Dima et al., 2003, J. Electroanal. Chem.)"
-    },
-    "Ammonium (NH4+)": {
-        "action_level": 1.0,
-        "escalation_level": 5.0,
-        "why_it_matters": "Forms chloramines with Cl-; NH3 slip.",
-        "citation": "Chloramine kinetics well studied. (Vikesland et al., 2001, ES&T)"
-    },
-    "Carbonate/Bicarbonate": {
-        "action_level": 100.0,
-        "escalation_level": 200.0,
-        "why_it_matters": "Consumes OH-; carbonate scaling.",
-        "citation": "CO2 absorption - carbonate formation in alkaline electrolytes. (Li et al., 2020, Nat. Catal.)"
-    },
-    "Phosphate (PO43-)": {
-        "action_level": 2.0,
-        "escalation_level": 5.0,
-        "why_it_matters": "Precipitates with Ca2+/Mg2+.",
-        "citation": "Electrochemically induced Ca-phosphate precipitation. (Snoeyink & Jenkins, 1980, Water Chemistry)"
-    },
-    "Iron (Fe2+/Fe3+)": {
-        "action_level": 0.1,
-        "escalation_level": 0.3,
-        "why_it_matters": "Hydroxide sludge; surface blocking.",
-        "citation": "Fe hydroxide precipitation and deposition on electrodes. (Zhang et al., 2016, J. Power Sources)"
-    },
-    "Manganese (Mn2+)": {
-        "action_level": 0.02,
-        "escalation_level": 0.05,
-        "why_it_matters": "Anodic MnO2 films (insulating).",
-        "citation": "Mn2+ oxidation - MnO2 deposits. (Post, 1999, Water Res.)"
-    },
-    "Copper (Cu2+)": {
-        "action_level": 0.05,
-        "escalation_level": 0.2,
-        "why_it_matters": "Cathodic plating; HER overpotential shifts.",
-        "citation": "Cu deposition on cathodes. (Fan et al., 2013, Electrochim. Acta)"
-    },
-    "Nickel (Ni2+)": {
-        "action_level": 0.05,
-        "escalation_level": 0.1,
-        "why_it_matters": "Precipitation/deposition; catalyst drift.",
-        "citation": "Ni hydroxide deposition documented. (Biesinger et al., 2009, Appl. Surf. Sci.)"
-    },
-    "Lead (Pb2+)": {
-        "action_level": 0.005,
-        "escalation_level": 0.01,
-        "why_it_matters": "Cathodic deposition; toxicity.",
-        "citation": "Pb deposition/interference. (Hu et al., 2003, Water Res.)"
-    },
-    "Cadmium (Cd2+)": {
-        "action_level": 0.001,
-        "escalation_level": 0.005,
-        "why_it_matters": "Deposition; toxicity.",
-        "citation": "Cd2+ electroreduction documented. (Chen et al., 2000, J. Appl. Electrochem.)"
-    },
-    "Mercury (Hg2+)": {
-        "action_level": 0.0005,
-        "escalation_level": 0.001,
-        "why_it_matters": "Amalgams; extreme toxicity.",
-        "citation": "Hg deposition and amalgam formation. (Liu et al., 2002, ES&T)"
-    }
-}
-
-NEUTRAL_DATA = {
-    "Chloride (Cl-)": {
-        "action_level": 5.0,
-        "escalation_level": 20.0,
-        "why_it_matters": "Cl2/HOCl formation competes strongly with OER at neutral pH.",
-        "citation": "Cl- oxidation more competitive at neutral; CER vs OER selectivity. (Zhong et al., 2020, Chem. Rev.)"
-    },
-    "Bromide (Br-)": {
-        "action_level": 0.1,
-        "escalation_level": 0.5,
-        "why_it_matters": "HOBr/BrO3- formation.",
-        "citation": "Bromide oxidized to bromate at neutral. (von Gunten, 2003, Water Res.)"
-    },
-    "Iodide (I-)": {
-        "action_level": 0.02,
-        "escalation_level": 0.1,
-        "why_it_matters": "I2/iodate; catalyst poisoning.",
-        "citation": "Iodide oxidation documented at neutral/alkaline. (Heeb et al., 2014, ES&T)"
-    },
-    "Sulphide (HS-/S2-)": {
-        "action_level": 0.02,
-        "escalation_level": 0.2,
-        "why_it_matters": "Rapid anodic oxidation; fouling.",
-        "citation": "HS- oxidation to S0; poisoning electrodes. (Jiang et al., 2017, J. Hazard. Mater.)"
-    },
-    "Cyanide (CN-)": {
-        "action_level": 0.005,
-        "escalation_level": 0.02,
-        "why_it_matters": "Oxidized; CNCl with Cl-.",
-        "citation": "Electrochemical CN oxidation. (Rodriguez et al., 2002, Ind. Eng. Chem. Res.)"
-    },
-    "Nitrate (NO3- as N)": {
-        "action_level": 2.0,
-        "escalation_level": 10.0,
-        "why_it_matters": "Competes with HER; reduced to NH3/NO/N2O.",
-        "citation": "Nitrate reduction well studied. (Rosca et al., 2009, Chem. Rev.)"
-    },
-    "Nitrite (NO2- as N)": {
-        "action_level": 0.1,
-        "escalation_level": 1.0,
-        "why_it_matters": "Cathodic reduction products NO/N2O/NH3.",
-        "citation": "Nitrite reduction pathways documented. (Dima et al., 2003, J. Electroanal. Chem.)"
-    },
-    "Ammonium (NH4+)": {
-        "action_level": 0.5,
-        "escalation_level": 2.0,
-        "why_it_matters": "Forms chloramines with HOCl from Cl-.",
-        "citation": "Chloramine formation kinetics at neutral pH. (Vikesland et al., 2001, ES&T)"
-    },
-    "Phosphate (PO43-)": {
-        "action_level": 3.0,
-        "escalation_level": 8.0,
-        "why_it_matters": "Ca/Mg phosphate scaling.",
-        "citation": "Electrochemically induced phosphate precipitation. (Snoeyink & Jenkins, 1980)"
-    },
-    "Carbonate/Bicarbonate": {
-        "action_level": 150.0,
-        "escalation_level": 300.0,
-        "why_it_matters": "Buffering; CaCO3 scaling possible.",
-        "citation": "CO2/HCO3- impacts scaling, OER efficiency. (Li et al., 2020, Nat. Catal.)"
-    },
-    "Calcium (Ca2+)": {
-        "action_level": 40.0,
-        "escalation_level": 100.0,
-        "why_it_matters": "CaCO3/CaSO4 scale.",
-        "citation": "Scaling tendency known. (Stumm & Morgan, 1996, Aquatic Chemistry)"
-    },
-    "Magnesium (Mg2+)": {
-        "action_level": 20.0,
-        "escalation_level": 60.0,
-        "why_it_matters": "MgCO3/Mg-phosphate scaling.",
-        "citation": "Scaling risk with phosphate. (Stumm & Morgan, 1996)"
-    },
-    "Barium (Ba2+)": {
-        "action_level": 0.03,
-        "escalation_level": 0.1,
-        "why_it_matters": "BaSO4 insoluble scale.",
-        "citation": "BaSO4 precipitation well documented. (Snoeyink & Jenkins, 1980)"
-    },
-    "Strontium (Sr2+)": {
-        "action_level": 0.1,
-        "escalation_level": 0.3,
-        "why_it_matters": "SrSO4/SrCO3 scaling.",
-        "citation": "Sr salts scale similarly to Ba. (Stumm & Morgan, 1996)"
-    },
-    "Iron (Fe2+/Fe3+)": {
-        "action_level": 0.05,
-        "escalation_level": 0.2,
-        "why_it_matters": "Soluble at neutral - electrode fouling.",
-        "citation": "Fe redox cycling and fouling documented. (Zhang et al., 2016)"
-    },
-    "Manganese (Mn2+)": {
-        "action_level": 0.02,
-        "escalation_level": 0.05,
-        "why_it_matters": "Oxidized to MnO2 (insulating).",
-        "citation": "Mn2+ - MnO2 passivation. (Post, 1999, Water Res.)"
-    },
-    "Copper (Cu2+)": {
-        "action_level": 0.02,
-        "escalation_level": 0.1,
-        "why_it_matters": "Cathodic plating.",
-        "citation": "Cu deposition observed. (Fan et al., 2013, Electrochim. Acta)"
-    },
-    "Nickel (Ni2+)": {
-        "action_level": 0.03,
-        "escalation_level": 0.1,
-        "why_it_matters": "Deposition/poisoning.",
-        "citation": "Ni hydroxide deposition. (Biesinger et al., 2009)"
-    },
-    "Lead (Pb2+)": {
-        "action_level": 0.003,
-        "escalation_level": 0.01,
-        "why_it_matters": "Cathodic deposition.",
-        "citation": "Pb deposition. (Hu et al., 2003, Water Res.)"
-    },
-    "Cadmium (Cd2+)": {
-        "action_level": 0.001,
-        "escalation_level": 0.005,
-        "why_it_matters": "Deposition.",
-        "citation": "Cd2+ electroreduction documented. (Chen et al., 2000)"
-    },
-    "Mercury (Hg2+)": {
-        "action_level": 0.0005,
-        "escalation_level": 0.001,
-        "why_it_matters": "Amalgams.",
-        "citation": "Hg deposition/amalgam. (Liu et al., 2002, ES&T)"
-    }
-}
+APP_PROFILE.mark("page setup")
 
 
-def get_status(concentration, action_level, escalation_level):
-    """Determine the status based on concentration levels."""
-    if concentration >= escalation_level:
-        return "escalation"
-    elif concentration >= action_level:
-        return "action"
-    else:
-        return "safe"
+@st.cache_resource
+def get_anomaly_detector():
+    """Return the anomaly detector shared across sessions."""
+    from anomaly import RobustAnomalyDetector
+    
+    return RobustAnomalyDetector()
 
 
-def get_status_color(status):
-    """Return color based on status."""
-    if status == "escalation":
-        return STATUS_RED
-    elif status == "action":
-        return STATUS_ORANGE
-    else:
-        return STATUS_GREEN
+@st.cache_resource
+def get_sample_index():
+    """Return the persistent sample index shared across sessions."""
+    return SampleIndex(SAMPLE_INDEX_PATH)
 
 
-def get_status_message(status, analyte, concentration, data):
-    """Generate status message based on the concentration level."""
-    if status == "safe":
-        return f"Concentration is within safe limits (below {data['action_level']} mg/L action level)."
-    elif status == "action":
-        return f"ACTION LEVEL REACHED: This could start happening - {data['why_it_matters']} Reference: {data['citation']}"
-    else:
-        return f"ESCALATION LEVEL REACHED: This is serious and green hydrogen production should be stopped. {data['why_it_matters']} Reference: {data['citation']}"
+@st.cache_resource
+def get_alert_engine():
+    """Return the alert engine shared across sessions."""
+    from alerts import AlertEngine, FileSink, StdoutSink, WebhookSink
+    
+    sinks = [StdoutSink()]
+    if ALERT_FILE:
+        sinks.append(FileSink(ALERT_FILE))
+    if ALERT_WEBHOOK_URL:
+        sinks.append(WebhookSink(ALERT_WEBHOOK_URL))
+    overrides = None
+    if ALERT_SETTINGS:
+        with open(ALERT_SETTINGS, encoding="utf-8") as f:
+            overrides = json.load(f)
+    return AlertEngine(sinks, overrides=overrides)
 
 
-def create_heatmap(results_df):
-    """Create a heatmap visualization for the results."""
-    if results_df.empty:
+@st.cache_resource
+def get_results_archive():
+    """Return the results archive, or None when archiving is not configured."""
+    if not ARCHIVE_DIR:
         return None
+    from archive import ResultsArchive
     
-    # Create color mapping
-    color_map = {
-        "safe": 0,
-        "action": 0.5,
-        "escalation": 1
-    }
+    return ResultsArchive(ARCHIVE_DIR)
+
+
+@st.cache_resource
+def get_report_exporter():
+    """Return the background report exporter shared across sessions."""
+    from report import ReportExporter
     
-    results_df["color_value"] = results_df["status"].map(color_map)
-    
-    # Create heatmap
-    row_labels = ["Action Level", "Escalation Level"]
-    status_row = [color_map[s] for s in results_df["status"]]
-    heatmap_customdata = [
-        [
-            [concentration, status_label, action_level, escalation_level, times_threshold, times_escalation]
-            for concentration, status_label, action_level, escalation_level, times_threshold, times_escalation in zip(
-                results_df["concentration"],
-                results_df["status_label"],
-                results_df["action_level"],
-                results_df["escalation_level"],
-                results_df["times_threshold"],
-                results_df["times_escalation"]
-            )
-        ],
-        [
-            [concentration, status_label, action_level, escalation_level, times_threshold, times_escalation]
-            for concentration, status_label, action_level, escalation_level, times_threshold, times_escalation in zip(
-                results_df["concentration"],
-                results_df["status_label"],
-                results_df["action_level"],
-                results_df["escalation_level"],
-                results_df["times_threshold"],
-                results_df["times_escalation"]
+    return ReportExporter()
+
+
+@st.cache_data(max_entries=64)
+def get_figures(results_hash, _results_df):
+    """Build the charts once per distinct set of results."""
+    from charts import create_bar_chart, create_heatmap
+    
+    return create_heatmap(_results_df), create_bar_chart(_results_df)
+
+
+def render_chart(fig):
+    """Show a chart with its numeric arrays sent as compact typed arrays."""
+    from charts import compact_figure, payload_size
+    
+    # Compacted figures cannot be pickled, so they are built per run rather
+    # than cached; this takes about a millisecond
+    fig = compact_figure(fig)
+    st.plotly_chart(fig, use_container_width=True)
+    if SHOW_CHART_PAYLOAD:
+        st.caption(f"Chart payload: {payload_size(fig) / 1024:.1f} KB")
+
+
+def render_report_downloads(results, results_hash):
+    """Offer each report format for download, rendering it in the background on request."""
+    from report import REPORT_FORMATS
+    
+    requested = st.session_state.setdefault("report_requests", set())
+    futures = {
+        fmt: get_report_exporter().submit(results, fmt, key=results_hash)
+        for fmt in REPORT_FORMATS
+        if (results_hash, fmt) in requested
+    }
+    pending = not all(future.done() for future in futures.values())
+    
+    # Poll only while a requested render is running; when the last one
+    # finishes, a full rerun registers the fragment again without polling
+    @st.fragment(run_every=1.0 if pending else None)
+    def downloads():
+        if pending and all(future.done() for future in futures.values()):
+            st.rerun(scope="app")
+        for col, fmt in zip(st.columns(len(REPORT_FORMATS)), REPORT_FORMATS):
+            future = futures.get(fmt)
+            with col:
+                if future is None:
+                    if st.button(f"Prepare {fmt.upper()}", key=f"prepare_{fmt}", use_container_width=True):
+                        requested.add((results_hash, fmt))
+                        st.rerun(scope="app")
+                elif not future.done():
+                    st.button(f"Preparing {fmt.upper()}...", key=f"report_{fmt}", disabled=True, use_container_width=True)
+                elif future.exception() is not None:
+                    st.button(f"{fmt.upper()} unavailable", key=f"report_{fmt}", disabled=True, use_container_width=True, help=str(future.exception()))
+                else:
+                    st.download_button(
+                        f"Download {fmt.upper()}",
+                        data=future.result(),
+                        file_name=f"wastewater_report.{fmt}",
+                        mime=REPORT_FORMATS[fmt],
+                        key=f"report_{fmt}",
+                        use_container_width=True
+                    )
+    
+    downloads()
+
+
+def render_site_reports(scored):
+    """Offer a ZIP of per-site reports for an upload, rendering them in the background on request."""
+    from comparison import worst_readings_by_site
+    from report import REPORT_FORMATS, zip_reports
+    
+    fmt = st.selectbox("Report Format", options=list(REPORT_FORMATS), format_func=str.upper)
+    # {format: {"futures": {site: future}, "archive": ZIP bytes once every site is done}}, reset per upload
+    batches = st.session_state.site_reports
+    batch = batches.get(fmt)
+    pending = batch is not None and not all(future.done() for future in batch["futures"].values())
+    
+    # Same polling as render_report_downloads: only while the batch renders
+    @st.fragment(run_every=1.0 if pending else None)
+    def site_reports():
+        if batch is None:
+            if st.button("Generate Site Reports"):
+                batches[fmt] = {
+                    "futures": get_report_exporter().export_batch(worst_readings_by_site(scored), fmt),
+                    "archive": None
+                }
+                st.rerun(scope="app")
+            return
+        futures = batch["futures"]
+        done = sum(future.done() for future in futures.values())
+        if done < len(futures):
+            st.button(f"Rendering site reports ({done}/{len(futures)})...", disabled=True)
+            return
+        if pending:
+            st.rerun(scope="app")
+        
+        failed = [str(site) for site, future in futures.items() if future.exception() is not None]
+        if failed:
+            st.warning(f"Could not render reports for: {', '.join(failed)}")
+        if batch["archive"] is None:
+            batch["archive"] = zip_reports(
+                {site: future.result() for site, future in futures.items() if future.exception() is None}, fmt
             )
-        ]
-    ]
+        st.download_button(
+            "Download Site Reports (ZIP)",
+            data=batch["archive"],
+            file_name=f"site_reports_{fmt}.zip",
+            mime="application/zip"
+        )
+    
+    site_reports()
+
+
+def render_footer():
+    """Render the page footer."""
+    st.markdown("---")
+    st.markdown(f"""
+    <div style='text-align:center; color:{LIGHT_GREY}; font-family:Hind; padding:20px;'>
+        <p style='margin:0;'>HydroStar Europe Ltd. </p>
+        <p style='margin:5px 0 0 0; font-size:12px;'>For inquiries, contact: domanique@hydrostar-eu.com | www.hydrostar-eu.com</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+
+def render_comparison(default_ph, default_site):
+    """Render the samples x analytes comparison view."""
+    from comparison import (
+        MATRIX_VALUES, STATUS_ORDER, build_matrix, filter_by_worst_status,
+        read_samples_csv, score_samples, worst_status_counts
+    )
+    from report import anomaly_notice_html, summary_card_html, summary_cards
+    from units import normalize_units
     
-    fig = go.Figure(data=go.Heatmap(
-        z=[status_row, status_row],
-        x=results_df["analyte"],
-        y=row_labels,
-        colorscale=[
-            [0, STATUS_GREEN],
-            [0.5, STATUS_ORANGE],
-            [1, STATUS_RED]
-        ],
-        xgap=2,
-        ygap=2,
-        showscale=False,
-        hovertemplate=(
-            "<b>%{x}</b>"
-            "<br>Threshold Row: %{y}"
-            "<br>Concentration: %{customdata[0]:.4f} mg/L"
-            "<br>Action Level: %{customdata[2]:.4f} mg/L"
-            "<br>Escalation Level: %{customdata[3]:.4f} mg/L"
-            "<br>Action Multiplier: %{customdata[4]:.1f}x"
-            "<br>Escalation Multiplier: %{customdata[5]:.1f}x"
-            "<br>Status: %{customdata[1]}"
-            "<extra></extra>"
-        ),
-        customdata=heatmap_customdata
-    ))
-    
-    # Add text annotations
-    for i, row in results_df.iterrows():
-        action_text = f"{row['times_threshold']:.1f}x" if row["times_threshold"] >= 1 else "OK"
-        escalation_text = f"{row['times_escalation']:.1f}x" if row["times_escalation"] >= 1 else "OK"
-        fig.add_annotation(
-            x=row["analyte"],
-            y=row_labels[0],
-            text=action_text,
-            showarrow=False,
-            font=dict(color=TEXT_BLACK, size=11, family="Hind")
+    st.markdown(f"<h2 style='color:{SECONDARY_GREEN}; font-family:Hind;'>Compare Samples</h2>", unsafe_allow_html=True)
+    
+    st.markdown(f"""
+    <div style='background-color:white; padding:15px; border-radius:8px; border-left:5px solid {PRIMARY_GREEN}; margin-bottom:20px;'>
+        <p style='margin:0; font-family:Hind; color:{DARK_GREY};'>
+            Upload a CSV file with one row per reading and the columns <strong>sample</strong>, 
+            <strong>analyte</strong> and <strong>concentration</strong> (mg/L), plus an optional 
+            <strong>ph</strong> column with each sample's measured pH and an optional <strong>site</strong> 
+            column. Samples with different pH values are scored against their own thresholds. 
+            An optional <strong>unit</strong> column (e.g. µg/L, mmol/L, mg/L as CaCO3, mg/L as NO3) 
+            is converted to mg/L before scoring.
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    uploaded = st.file_uploader("Samples CSV", type=["csv"])
+    if uploaded is None:
+        return
+    
+    try:
+        samples = read_samples_csv(uploaded)
+    except ValueError as e:
+        st.error(f"Could not read the samples file: {e}")
+        return
+    
+    samples, unknown_units = normalize_units(samples)
+    if unknown_units:
+        st.warning(f"Skipped readings with units that could not be converted to mg/L: {', '.join(unknown_units)}")
+    
+    scored, unknown = score_samples(samples, default_ph)
+    if unknown:
+        st.warning(f"Skipped readings for analytes without thresholds at the sample pH: {', '.join(unknown)}")
+    if scored.empty:
+        st.warning("No readings matched an analyte with thresholds at the sample pH.")
+        return
+    
+    # Feed each upload to the alert engine and anomaly detector once, not on every rerun
+    if st.session_state.get("alerted_upload") != uploaded.file_id:
+        readings = scored.assign(
+            site=scored["site"].astype(str) if "site" in scored else default_site,
+            analyte=scored["analyte"].astype(str)
+        )
+        get_alert_engine().evaluate(readings)
+        anomalies = get_anomaly_detector().observe(readings)
+        flagged = anomalies["anomaly"].to_numpy()
+        st.session_state.upload_anomalies = readings.loc[flagged, ["sample", "site", "analyte", "concentration"]].assign(
+            reason=anomalies.loc[flagged, "anomaly_reason"]
         )
-        fig.add_annotation(
-            x=row["analyte"],
-            y=row_labels[1],
-            text=escalation_text,
-            showarrow=False,
-            font=dict(color=TEXT_BLACK, size=11, family="Hind")
+        st.session_state.alerted_upload = uploaded.file_id
+        st.session_state.site_reports = {}
+    
+    upload_anomalies = st.session_state.upload_anomalies
+    if not upload_anomalies.empty:
+        st.markdown(anomaly_notice_html(len(upload_anomalies), "their site"), unsafe_allow_html=True)
+        st.dataframe(upload_anomalies, use_container_width=True, hide_index=True)
+    
+    col_value, col_status, col_order = st.columns(3)
+    with col_value:
+        value_label = st.selectbox("Show", options=list(MATRIX_VALUES.keys()))
+    with col_status:
+        min_status = st.selectbox(
+            "Minimum Worst Status",
+            options=STATUS_ORDER,
+            format_func=str.capitalize
         )
+    with col_order:
+        order = st.selectbox("Sort", options=["Worst first", "Best first"])
     
-    fig.update_layout(
-        title=dict(
-            text="Water Quality vs Threshold Levels",
-            font=dict(size=18, color=TEXT_BLACK, family="Hind")
-        ),
-        xaxis=dict(
-            title=dict(text="Analyte", font=dict(size=12, color=TEXT_BLACK, family="Hind")),
-            tickangle=45,
-            tickfont=dict(size=10, color=TEXT_BLACK, family="Hind")
-        ),
-        yaxis=dict(
-            title=dict(text="", font=dict(size=12, color=TEXT_BLACK, family="Hind")),
-            tickfont=dict(size=12, color=TEXT_BLACK, family="Hind"),
-            autorange="reversed"
-        ),
-        height=340,
-        margin=dict(l=50, r=50, t=50, b=150),
-        paper_bgcolor=PLOT_BG,
-        plot_bgcolor=PLOT_BG,
-        font=dict(color=TEXT_BLACK, family="Hind")
-    )
+    matrix = build_matrix(scored, MATRIX_VALUES[value_label])
+    counts = worst_status_counts(matrix)
     
-    return fig
-
-
-def create_bar_chart(results_df):
-    """Create a bar chart comparing concentrations to thresholds."""
-    if results_df.empty:
-        return None
+    cards = [("Total Samples", len(matrix), DARK_GREY)] + summary_cards({**counts.to_dict(), "total": len(matrix)})[1:]
+    for col, card in zip(st.columns(4), cards):
+        with col:
+            st.markdown(summary_card_html(*card), unsafe_allow_html=True)
     
-    fig = go.Figure()
-    
-    # Add bars for user concentration
-    fig.add_trace(go.Bar(
-        name="Your Concentration",
-        x=results_df["analyte"],
-        y=results_df["concentration"],
-        marker_color=[get_status_color(s) for s in results_df["status"]],
-        hovertemplate="<b>%{x}</b><br>Your Concentration: %{y:.4f} mg/L<extra></extra>"
-    ))
-    
-    # Add line for action level
-    fig.add_trace(go.Scatter(
-        name="Action Level",
-        x=results_df["analyte"],
-        y=results_df["action_level"],
-        mode="markers+lines",
-        marker=dict(symbol="diamond", size=10, color=STATUS_ORANGE),
-        line=dict(color=STATUS_ORANGE, dash="dash"),
-        hovertemplate="<b>%{x}</b><br>Action Level: %{y:.4f} mg/L<extra></extra>"
-    ))
-    
-    # Add line for escalation level
-    fig.add_trace(go.Scatter(
-        name="Escalation Level",
-        x=results_df["analyte"],
-        y=results_df["escalation_level"],
-        mode="markers+lines",
-        marker=dict(symbol="x", size=10, color=STATUS_RED),
-        line=dict(color=STATUS_RED, dash="dot"),
-        hovertemplate="<b>%{x}</b><br>Escalation Level: %{y:.4f} mg/L<extra></extra>"
-    ))
-    
-    fig.update_layout(
-        title=dict(
-            text="Concentration Comparison",
-            font=dict(size=18, color=TEXT_BLACK, family="Hind")
-        ),
-        xaxis=dict(
-            title=dict(text="Analyte", font=dict(size=12, color=TEXT_BLACK, family="Hind")),
-            tickangle=45,
-            tickfont=dict(size=10, color=TEXT_BLACK, family="Hind")
-        ),
-        yaxis=dict(
-            title=dict(text="Concentration (mg/L)", font=dict(size=12, color=TEXT_BLACK, family="Hind")),
-            tickfont=dict(size=10, color=TEXT_BLACK, family="Hind"),
-            type="log"
-        ),
-        barmode="group",
-        height=400,
-        margin=dict(l=50, r=50, t=50, b=150),
-        paper_bgcolor=PLOT_BG,
-        plot_bgcolor=PLOT_BG,
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1,
-            font=dict(family="Hind", color=TEXT_BLACK)
-        ),
-        font=dict(color=TEXT_BLACK, family="Hind")
-    )
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    filtered = filter_by_worst_status(matrix, min_status, descending=order == "Worst first")
+    st.dataframe(filtered, use_container_width=True, height=600)
     
-    return fig
+    if "site" in scored:
+        st.markdown(f"<h3 style='color:{SECONDARY_GREEN}; font-family:Hind;'>Site Reports</h3>", unsafe_allow_html=True)
+        st.markdown(
+            f"<p style='color:{LIGHT_GREY}; font-family:Hind;'>One report per site, built from each analyte's worst reading at that site.</p>",
+            unsafe_allow_html=True
+        )
+        render_site_reports(scored)
 
 
 # Initialize session state
@@ -610,6 +462,9 @@ if "analyte_entries" not in st.session_state:
 if "results" not in st.session_state:
     st.session_state.results = []
 
+if "results_hash" not in st.session_state:
+    st.session_state.results_hash = None
+
 
 # Header with logo
 col_logo, col_title = st.columns([1, 5])
@@ -633,17 +488,43 @@ st.markdown("---")
 with st.sidebar:
     st.markdown(f"<h2 style='color:{PRIMARY_GREEN}; font-family:Hind;'>Configuration</h2>", unsafe_allow_html=True)
     
-    ph_type = st.selectbox(
-        "Select Wastewater pH Type",
-        options=["Alkaline pH", "Neutral pH"],
-        index=1,
-        help="Select whether your wastewater is alkaline or neutral in pH"
+    view_mode = st.radio(
+        "Mode",
+        options=["Single Sample", "Compare Samples"],
+        help="Analyze one sample, or compare many samples side by side from a CSV file"
+    )
+    
+    sample_ph = st.number_input(
+        "Measured Sample pH",
+        min_value=0.0,
+        max_value=14.0,
+        value=DEFAULT_PH,
+        step=0.1,
+        format="%.1f",
+        help=(
+            f"Neutral thresholds apply up to pH {NEUTRAL_PH_MAX:.0f} and alkaline thresholds from pH "
+            f"{ALKALINE_PH_MIN:.0f}; in between, levels are interpolated. In Compare Samples mode, "
+            "this is used for samples without a ph column."
+        )
     )
     
-    # Get the appropriate data based on pH selection
-    current_data = ALKALINE_DATA if ph_type == "Alkaline pH" else NEUTRAL_DATA
+    # Get the thresholds for the measured pH
+    current_data = thresholds_for_ph(sample_ph)
     analyte_options = list(current_data.keys())
     
+    ph_regime = regime(sample_ph)
+    if ph_regime == "transition":
+        regime_text = f"Transition ({alkaline_weight(sample_ph):.0%} alkaline)"
+    else:
+        regime_text = ph_regime.capitalize()
+    st.markdown(f"<p style='color:{LIGHT_GREY}; font-family:Hind;'>Threshold regime: <strong>{regime_text}</strong></p>", unsafe_allow_html=True)
+    
+    site = st.text_input(
+        "Sampling Site",
+        value="Default Site",
+        help="Readings are compared against the recent history for this site to flag out-of-family values"
+    )
+    
     st.markdown("---")
     st.markdown(f"<h3 style='color:{PRIMARY_GREEN}; font-family:Hind;'>Legend</h3>", unsafe_allow_html=True)
     st.markdown(f"""
@@ -666,6 +547,13 @@ with st.sidebar:
     st.markdown("---")
     st.markdown(f"<p style='color:{LIGHT_GREY}; font-size:12px; font-family:Hind;'>HydroStar Europe Ltd.</p>", unsafe_allow_html=True)
 
+APP_PROFILE.mark("sidebar")
+
+if view_mode == "Compare Samples":
+    render_comparison(sample_ph, site)
+    render_footer()
+    st.stop()
+
 # Main content area
 st.markdown(f"<h2 style='color:{SECONDARY_GREEN}; font-family:Hind;'>Enter Analyte Concentrations</h2>", unsafe_allow_html=True)
 
@@ -737,176 +625,120 @@ with col_clear:
     if st.button("Clear All", use_container_width=True):
         st.session_state.analyte_entries = [{"analyte": None, "concentration": None}]
         st.session_state.results = []
+        st.session_state.results_hash = None
         st.rerun()
 
 # Analysis and Results
 if analyze_clicked:
     valid_entries = [
         e for e in st.session_state.analyte_entries
-        if e["analyte"] is not None and e["concentration"] is not None and e["concentration"] > 0
+        if e["analyte"] is not None and e["concentration"] is not None
     ]
     
     if not valid_entries:
-        st.warning("Please select at least one analyte and enter a concentration greater than 0.")
+        st.warning("Please select at least one analyte and enter its concentration.")
     else:
-        results = []
-        for entry in valid_entries:
-            analyte = entry["analyte"]
-            concentration = entry["concentration"]
-            data = current_data[analyte]
+        import pandas as pd
+        
+        results_hash = sample_hash(valid_entries, threshold_version(current_data), site)
+        sample_index = get_sample_index()
+        results = sample_index.get(results_hash)
+        
+        if results is not None:
+            st.info("This sample has already been analyzed. Showing the stored results.")
+        else:
+            results = [
+                build_result(entry["analyte"], entry["concentration"], current_data[entry["analyte"]])
+                for entry in valid_entries
+            ]
             
-            status = get_status(concentration, data["action_level"], data["escalation_level"])
+            anomaly_batch = pd.DataFrame({
+                "site": site,
+                "analyte": [r["analyte"] for r in results],
+                "concentration": [r["concentration"] for r in results]
+            })
+            anomalies = get_anomaly_detector().observe(anomaly_batch)
+            for result, anomaly, reason in zip(results, anomalies["anomaly"], anomalies["anomaly_reason"]):
+                result["anomaly"] = bool(anomaly)
+                result["anomaly_reason"] = reason
             
-            # Calculate times above thresholds
-            times_threshold = concentration / data["action_level"]
-            times_escalation = concentration / data["escalation_level"]
+            get_alert_engine().evaluate(pd.DataFrame({
+                "site": site,
+                "analyte": [r["analyte"] for r in results],
+                "concentration": [r["concentration"] for r in results],
+                "action_level": [r["action_level"] for r in results],
+                "escalation_level": [r["escalation_level"] for r in results]
+            }))
             
-            results.append({
-                "analyte": analyte,
-                "concentration": concentration,
-                "action_level": data["action_level"],
-                "escalation_level": data["escalation_level"],
-                "status": status,
-                "status_label": status.capitalize(),
-                "times_threshold": times_threshold,
-                "times_escalation": times_escalation,
-                "why_it_matters": data["why_it_matters"],
-                "citation": data["citation"],
-                "message": get_status_message(status, analyte, concentration, data)
-            })
+            sample_index.put(results_hash, results)
+            
+            archive = get_results_archive()
+            if archive is not None:
+                archive.append(results, site, sample_ph, sample_id=results_hash)
         
         st.session_state.results = results
+        st.session_state.results_hash = results_hash
 
 # Display results
 if st.session_state.results:
+    import pandas as pd
+    from report import (
+        anomaly_notice_html, result_card_html, status_banner_html, status_counts, summary_card_html, summary_cards
+    )
+    
     st.markdown("---")
     st.markdown(f"<h2 style='color:{SECONDARY_GREEN}; font-family:Hind;'>Analysis Results</h2>", unsafe_allow_html=True)
     
     results_df = pd.DataFrame(st.session_state.results)
     
     # Summary metrics
-    col1, col2, col3, col4 = st.columns(4)
-    
-    safe_count = len(results_df[results_df["status"] == "safe"])
-    action_count = len(results_df[results_df["status"] == "action"])
-    escalation_count = len(results_df[results_df["status"] == "escalation"])
-    total_count = len(results_df)
-    
-    with col1:
-        st.markdown(f"""
-        <div style='background-color:white; padding:20px; border-radius:10px; text-align:center; box-shadow: 0 2px 4px rgba(0,0,0,0.1);'>
-            <p style='color:{TEXT_BLACK}; margin:0; font-family:Hind;'>Total Analytes</p>
-            <p style='font-size:36px; font-weight:bold; color:{DARK_GREY}; margin:0; font-family:Hind;'>{total_count}</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown(f"""
-        <div style='background-color:white; padding:20px; border-radius:10px; text-align:center; box-shadow: 0 2px 4px rgba(0,0,0,0.1);'>
-            <p style='color:{TEXT_BLACK}; margin:0; font-family:Hind;'>Safe</p>
-            <p style='font-size:36px; font-weight:bold; color:{STATUS_GREEN}; margin:0; font-family:Hind;'>{safe_count}</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown(f"""
-        <div style='background-color:white; padding:20px; border-radius:10px; text-align:center; box-shadow: 0 2px 4px rgba(0,0,0,0.1);'>
-            <p style='color:{TEXT_BLACK}; margin:0; font-family:Hind;'>Action Level</p>
-            <p style='font-size:36px; font-weight:bold; color:{STATUS_ORANGE}; margin:0; font-family:Hind;'>{action_count}</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col4:
-        st.markdown(f"""
-        <div style='background-color:white; padding:20px; border-radius:10px; text-align:center; box-shadow: 0 2px 4px rgba(0,0,0,0.1);'>
-            <p style='color:{TEXT_BLACK}; margin:0; font-family:Hind;'>Escalation Level</p>
-            <p style='font-size:36px; font-weight:bold; color:{STATUS_RED}; margin:0; font-family:Hind;'>{escalation_count}</p>
-        </div>
-        """, unsafe_allow_html=True)
+    counts = status_counts(st.session_state.results)
+    for col, card in zip(st.columns(4), summary_cards(counts)):
+        with col:
+            st.markdown(summary_card_html(*card), unsafe_allow_html=True)
     
     st.markdown("<br>", unsafe_allow_html=True)
     
     # Overall status message
-    if escalation_count > 0:
-        st.markdown(f"""
-        <div style='background-color:#ffebee; padding:20px; border-radius:10px; border-left:5px solid {STATUS_RED}; margin-bottom:20px;'>
-            <h3 style='color:{STATUS_RED}; margin:0 0 10px 0; font-family:Hind;'>CRITICAL: Production Should Be Stopped</h3>
-            <p style='margin:0; font-family:Hind; color:{DARK_GREY};'>
-                One or more analytes have reached escalation levels. Green hydrogen production should be halted 
-                until wastewater treatment addresses these concentrations.
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
-    elif action_count > 0:
-        st.markdown(f"""
-        <div style='background-color:#fff3e0; padding:20px; border-radius:10px; border-left:5px solid {STATUS_ORANGE}; margin-bottom:20px;'>
-            <h3 style='color:{STATUS_ORANGE}; margin:0 0 10px 0; font-family:Hind;'>CAUTION: Action Required</h3>
-            <p style='margin:0; font-family:Hind; color:{DARK_GREY};'>
-                One or more analytes have reached action levels. Monitor closely and consider treatment 
-                to prevent escalation.
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
-    else:
-        st.markdown(f"""
-        <div style='background-color:#e8f5e9; padding:20px; border-radius:10px; border-left:5px solid {STATUS_GREEN}; margin-bottom:20px;'>
-            <h3 style='color:{STATUS_GREEN}; margin:0 0 10px 0; font-family:Hind;'>ALL CLEAR: Safe for Production</h3>
-            <p style='margin:0; font-family:Hind; color:{DARK_GREY};'>
-                All analytes are within safe limits. Your wastewater is suitable for green hydrogen production.
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
+    st.markdown(status_banner_html(counts), unsafe_allow_html=True)
+    
+    # Anomaly notice
+    anomaly_count = int(results_df["anomaly"].sum()) if "anomaly" in results_df else 0
+    if anomaly_count > 0:
+        st.markdown(anomaly_notice_html(anomaly_count, site), unsafe_allow_html=True)
     
     # Visualizations
     st.markdown(f"<h3 style='color:{SECONDARY_GREEN}; font-family:Hind;'>Visualizations</h3>", unsafe_allow_html=True)
     
+    heatmap_fig, bar_fig = get_figures(st.session_state.results_hash, results_df)
+    
     # Heatmap
-    heatmap_fig = create_heatmap(results_df)
     if heatmap_fig:
-        st.plotly_chart(heatmap_fig, use_container_width=True)
+        render_chart(heatmap_fig)
     
     # Bar chart
-    bar_fig = create_bar_chart(results_df)
     if bar_fig:
-        st.plotly_chart(bar_fig, use_container_width=True)
+        render_chart(bar_fig)
     
     # Detailed results
     st.markdown(f"<h3 style='color:{SECONDARY_GREEN}; font-family:Hind;'>Detailed Results</h3>", unsafe_allow_html=True)
     
     for result in st.session_state.results:
-        status = result["status"]
-        if status == "safe":
-            card_class = "status-safe"
-            icon = "OK"
-        elif status == "action":
-            card_class = "status-action"
-            icon = "!"
-        else:
-            card_class = "status-escalation"
-            icon = "X"
-        
-        st.markdown(f"""
-        <div class='status-card {card_class}'>
-            <div style='display:flex; justify-content:space-between; align-items:flex-start;'>
-                <div>
-                    <h4 style='margin:0 0 5px 0; color:{DARK_GREY}; font-family:Hind;'>{result["analyte"]}</h4>
-                    <p style='margin:0; font-family:Hind;'>
-                        <strong>Your Concentration:</strong> {result["concentration"]:.6f} mg/L | 
-                        <strong>Action Level:</strong> {result["action_level"]:.4f} mg/L | 
-                        <strong>Escalation Level:</strong> {result["escalation_level"]:.4f} mg/L
-                    </p>
-                    <p style='margin:10px 0 0 0; font-family:Hind; font-style:italic;'>{result["message"]}</p>
-                </div>
-                <div style='font-size:24px; font-weight:bold; color:{get_status_color(status)};'>{icon}</div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(result_card_html(result), unsafe_allow_html=True)
+    
+    # Report export
+    st.markdown(f"<h3 style='color:{SECONDARY_GREEN}; font-family:Hind;'>Export Report</h3>", unsafe_allow_html=True)
+    render_report_downloads(st.session_state.results, st.session_state.results_hash)
 
 # Footer
-st.markdown("---")
-st.markdown(f"""
-<div style='text-align:center; color:{LIGHT_GREY}; font-family:Hind; padding:20px;'>
-    <p style='margin:0;'>HydroStar Europe Ltd. </p>
-    <p style='margin:5px 0 0 0; font-size:12px;'>For inquiries, contact: domanique@hydrostar-eu.com | www.hydrostar-eu.com</p>
-</div>
-""", unsafe_allow_html=True)
+render_footer()
+
+if not APP_PROFILE.finished:
+    APP_PROFILE.finish("main content")
+    if PROFILE_STARTUP:
+        print(f"First script run profile:\n{APP_PROFILE.report()}", flush=True)
+
+if PROFILE_STARTUP:
+    with st.sidebar.expander("First Script Run Profile"):
+        st.code(APP_PROFILE.report())
+        st.caption("Streamlit is loaded before the script runs; run `python startup_profile.py` for per-module import costs.")
@@ -0,0 +1,188 @@
+"""Partitioned Parquet archive of scored results.
+
+Scored batches are appended to a Parquet dataset partitioned by site,
+threshold regime and month (hive layout, e.g.
+``site=Plant%20A/regime=neutral/month=2025-03/part-....parquet``). Queries
+push analyte, status and date filters into the dataset scan, so partitions
+and row groups that cannot match are skipped instead of read.
+
+Each append writes a small file, so once a partition holds
+``compact_after`` files they are rewritten into one file sorted by analyte,
+status and time with large row groups. ``compact()`` does the same for
+every partition.
+"""
+import glob
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from thresholds import STATUS_ORDER, regime
+
+PARTITION_COLUMNS = ["site", "regime", "month"]
+
+SCHEMA = pa.schema([
+    ("site", pa.string()),
+    ("regime", pa.string()),
+    ("month", pa.string()),
+    ("analyzed_at", pa.timestamp("ms", tz="UTC")),
+    ("sample_id", pa.string()),
+    ("ph", pa.float32()),
+    ("analyte", pa.string()),
+    ("concentration", pa.float64()),
+    ("action_level", pa.float64()),
+    ("escalation_level", pa.float64()),
+    ("status", pa.string()),
+    ("status_label", pa.string()),
+    ("times_threshold", pa.float64()),
+    ("times_escalation", pa.float64()),
+    ("why_it_matters", pa.string()),
+    ("citation", pa.string()),
+    ("message", pa.string()),
+    ("anomaly", pa.bool_()),
+    ("anomaly_reason", pa.string())
+])
+
+_PARTITIONING = ds.partitioning(
+    pa.schema([(name, pa.string()) for name in PARTITION_COLUMNS]),
+    flavor="hive"
+)
+
+
+class ResultsArchive:
+    """Append-only Parquet archive of scored results dicts."""
+
+    def __init__(self, root, row_group_size=64 * 1024, compact_after=32):
+        self.root = root
+        self.row_group_size = row_group_size
+        self.compact_after = compact_after
+        self._lock = threading.Lock()
+
+    def append(self, results, site, ph, analyzed_at=None, sample_id=None):
+        """Append one scored batch (a list of results dicts) to the archive."""
+        if not results:
+            return
+        analyzed_at = analyzed_at or datetime.now(timezone.utc)
+        if analyzed_at.tzinfo is None:
+            analyzed_at = analyzed_at.replace(tzinfo=timezone.utc)
+
+        df = pd.DataFrame(results)
+        df["site"] = site
+        df["regime"] = regime(ph)
+        df["month"] = analyzed_at.strftime("%Y-%m")
+        df["analyzed_at"] = pd.Timestamp(analyzed_at).floor("ms")
+        df["sample_id"] = sample_id
+        df["ph"] = ph
+        for column in ("anomaly", "anomaly_reason"):
+            if column not in df:
+                df[column] = None
+        # Sorting clusters analyte and status values so row-group statistics prune well
+        df = df.sort_values(["analyte", "status"], kind="stable")
+
+        table = pa.Table.from_pandas(df[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+        written = []
+        pq.write_to_dataset(
+            table,
+            self.root,
+            partitioning=_PARTITIONING,
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            row_group_size=self.row_group_size,
+            existing_data_behavior="overwrite_or_ignore",
+            file_visitor=lambda file: written.append(file.path)
+        )
+        for directory in {os.path.dirname(path) for path in written}:
+            if len(_data_files(directory)) >= self.compact_after:
+                self.compact_partition(directory)
+
+    def compact_partition(self, directory):
+        """Rewrite one partition directory into a single sorted file.
+
+        The new file is written under a hidden name and renamed into place
+        before the old files are removed, so a concurrent scan may briefly
+        see rows twice but never misses any.
+        """
+        with self._lock:
+            files = _data_files(directory)
+            if len(files) < 2:
+                return
+            table = pa.concat_tables([pq.read_table(path) for path in files])
+            # Same clustering as append, across the whole partition
+            table = table.sort_by([(name, "ascending") for name in ("analyte", "status", "analyzed_at")])
+            name = f"compacted-{uuid.uuid4().hex}.parquet"
+            staging = os.path.join(directory, f".{name}")
+            pq.write_table(table, staging, row_group_size=self.row_group_size)
+            os.replace(staging, os.path.join(directory, name))
+            for path in files:
+                os.remove(path)
+
+    def compact(self):
+        """Compact every partition holding more than one file."""
+        if not os.path.isdir(self.root):
+            return
+        for directory, _, _ in os.walk(self.root):
+            self.compact_partition(directory)
+
+    def dataset(self):
+        """Return the archive as a pyarrow dataset."""
+        return ds.dataset(self.root, format="parquet", partitioning=_PARTITIONING)
+
+    def query(self, analytes=None, statuses=None, start=None, end=None,
+              sites=None, regimes=None, columns=None):
+        """Return archived rows matching the filters as a DataFrame.
+
+        ``start`` (inclusive) and ``end`` (exclusive) bound ``analyzed_at``
+        and also prune month partitions. Every filter is pushed down into the
+        dataset scan.
+        """
+        if not os.path.isdir(self.root):
+            table = SCHEMA.empty_table()
+            table = table.select(columns) if columns is not None else table
+        else:
+            expression = _filter_expression(analytes, statuses, start, end, sites, regimes)
+            table = self.dataset().to_table(columns=columns, filter=expression)
+        df = table.to_pandas()
+        # Stored as plain strings so row-group statistics can prune the scan
+        if "analyte" in df:
+            df["analyte"] = df["analyte"].astype("category")
+        if "status" in df:
+            df["status"] = df["status"].astype(pd.CategoricalDtype(STATUS_ORDER, ordered=True))
+        return df
+
+
+def _data_files(directory):
+    return sorted(glob.glob(os.path.join(directory, "*.parquet")))
+
+
+def _timestamp(value):
+    value = pd.Timestamp(value)
+    return value.tz_localize("UTC") if value.tzinfo is None else value.tz_convert("UTC")
+
+
+def _filter_expression(analytes, statuses, start, end, sites, regimes):
+    conditions = []
+    if analytes is not None:
+        conditions.append(ds.field("analyte").isin(list(analytes)))
+    if statuses is not None:
+        conditions.append(ds.field("status").isin(list(statuses)))
+    if sites is not None:
+        conditions.append(ds.field("site").isin(list(sites)))
+    if regimes is not None:
+        conditions.append(ds.field("regime").isin(list(regimes)))
+    if start is not None:
+        start = _timestamp(start)
+        conditions.append(ds.field("month") >= start.strftime("%Y-%m"))
+        conditions.append(ds.field("analyzed_at") >= pa.scalar(start.to_pydatetime(), pa.timestamp("ms", tz="UTC")))
+    if end is not None:
+        end = _timestamp(end)
+        conditions.append(ds.field("month") <= end.strftime("%Y-%m"))
+        conditions.append(ds.field("analyzed_at") < pa.scalar(end.to_pydatetime(), pa.timestamp("ms", tz="UTC")))
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
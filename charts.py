@@ -0,0 +1,213 @@
+"""Plotly charts for analysis results.
+
+Figures shown in the app are passed through ``compact_figure`` first, which
+sends numeric arrays as base64 typed arrays instead of JSON number lists.
+"""
+import base64
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from theme import PLOT_BG, STATUS_GREEN, STATUS_ORANGE, STATUS_RED, TEXT_BLACK, get_status_color
+
+# orjson serializes figures several times faster than the stdlib encoder
+pio.json.config.default_engine = "orjson"
+
+STATUS_CODES = {"safe": 0, "action": 1, "escalation": 2}
+
+# Trace properties sent as typed arrays when they hold numeric data
+TYPED_ARRAY_PROPERTIES = ("x", "y", "z", "customdata")
+
+
+def create_heatmap(results_df):
+    """Create a heatmap visualization for the results."""
+    if results_df.empty:
+        return None
+    
+    # Status codes 0/1/2 map onto the 0/0.5/1 colorscale stops via zmin/zmax
+    status_codes = results_df["status"].map(STATUS_CODES).to_numpy(dtype=np.int8)
+    row_labels = ["Action Level", "Escalation Level"]
+    
+    # Each row only carries its own level and multiplier; the concentration
+    # and status are shared, so neither is repeated per threshold
+    concentration = results_df["concentration"].to_numpy(dtype=np.float64)
+    levels = np.vstack([results_df["action_level"], results_df["escalation_level"]]).astype(np.float64)
+    multipliers = np.vstack([results_df["times_threshold"], results_df["times_escalation"]]).astype(np.float64)
+    customdata = np.stack([np.broadcast_to(concentration, levels.shape), levels, multipliers], axis=-1)
+    cell_text = np.where(multipliers >= 1, np.char.mod("%.1fx", multipliers), "OK")
+    status_labels = results_df["status_label"].tolist()
+    
+    fig = go.Figure(data=go.Heatmap(
+        z=np.vstack([status_codes, status_codes]),
+        zmin=0,
+        zmax=2,
+        x=results_df["analyte"],
+        y=row_labels,
+        colorscale=[
+            [0, STATUS_GREEN],
+            [0.5, STATUS_ORANGE],
+            [1, STATUS_RED]
+        ],
+        xgap=2,
+        ygap=2,
+        showscale=False,
+        text=cell_text.tolist(),
+        texttemplate="%{text}",
+        textfont=dict(color=TEXT_BLACK, size=11, family="Hind"),
+        hovertext=[status_labels, status_labels],
+        hovertemplate=(
+            "<b>%{x}</b>"
+            "<br>Concentration: %{customdata[0]:.4f} mg/L"
+            "<br>%{y}: %{customdata[1]:.4f} mg/L"
+            "<br>Multiplier: %{customdata[2]:.1f}x"
+            "<br>Status: %{hovertext}"
+            "<extra></extra>"
+        ),
+        customdata=customdata
+    ))
+    
+    fig.update_layout(
+        title=dict(
+            text="Water Quality vs Threshold Levels",
+            font=dict(size=18, color=TEXT_BLACK, family="Hind")
+        ),
+        xaxis=dict(
+            title=dict(text="Analyte", font=dict(size=12, color=TEXT_BLACK, family="Hind")),
+            tickangle=45,
+            tickfont=dict(size=10, color=TEXT_BLACK, family="Hind")
+        ),
+        yaxis=dict(
+            title=dict(text="", font=dict(size=12, color=TEXT_BLACK, family="Hind")),
+            tickfont=dict(size=12, color=TEXT_BLACK, family="Hind"),
+            autorange="reversed"
+        ),
+        height=340,
+        margin=dict(l=50, r=50, t=50, b=150),
+        paper_bgcolor=PLOT_BG,
+        plot_bgcolor=PLOT_BG,
+        font=dict(color=TEXT_BLACK, family="Hind")
+    )
+    
+    return fig
+
+
+def create_bar_chart(results_df):
+    """Create a bar chart comparing concentrations to thresholds."""
+    if results_df.empty:
+        return None
+    
+    fig = go.Figure()
+    
+    # Add bars for user concentration
+    fig.add_trace(go.Bar(
+        name="Your Concentration",
+        x=results_df["analyte"],
+        y=results_df["concentration"],
+        marker_color=[get_status_color(s) for s in results_df["status"]],
+        hovertemplate="<b>%{x}</b><br>Your Concentration: %{y:.4f} mg/L<extra></extra>"
+    ))
+    
+    # Add line for action level
+    fig.add_trace(go.Scatter(
+        name="Action Level",
+        x=results_df["analyte"],
+        y=results_df["action_level"],
+        mode="markers+lines",
+        marker=dict(symbol="diamond", size=10, color=STATUS_ORANGE),
+        line=dict(color=STATUS_ORANGE, dash="dash"),
+        hovertemplate="<b>%{x}</b><br>Action Level: %{y:.4f} mg/L<extra></extra>"
+    ))
+    
+    # Add line for escalation level
+    fig.add_trace(go.Scatter(
+        name="Escalation Level",
+        x=results_df["analyte"],
+        y=results_df["escalation_level"],
+        mode="markers+lines",
+        marker=dict(symbol="x", size=10, color=STATUS_RED),
+        line=dict(color=STATUS_RED, dash="dot"),
+        hovertemplate="<b>%{x}</b><br>Escalation Level: %{y:.4f} mg/L<extra></extra>"
+    ))
+    
+    fig.update_layout(
+        title=dict(
+            text="Concentration Comparison",
+            font=dict(size=18, color=TEXT_BLACK, family="Hind")
+        ),
+        xaxis=dict(
+            title=dict(text="Analyte", font=dict(size=12, color=TEXT_BLACK, family="Hind")),
+            tickangle=45,
+            tickfont=dict(size=10, color=TEXT_BLACK, family="Hind")
+        ),
+        yaxis=dict(
+            title=dict(text="Concentration (mg/L)", font=dict(size=12, color=TEXT_BLACK, family="Hind")),
+            tickfont=dict(size=10, color=TEXT_BLACK, family="Hind"),
+            type="log"
+        ),
+        barmode="group",
+        height=400,
+        margin=dict(l=50, r=50, t=50, b=150),
+        paper_bgcolor=PLOT_BG,
+        plot_bgcolor=PLOT_BG,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            font=dict(family="Hind", color=TEXT_BLACK)
+        ),
+        font=dict(color=TEXT_BLACK, family="Hind")
+    )
+    
+    return fig
+
+
+def _typed_array(values):
+    """Encode a numeric array as a plotly.js base64 typed-array spec."""
+    array = np.asarray(values)
+    if array.dtype == np.bool_:
+        array = array.astype(np.uint8)
+    elif array.dtype.kind in "iu" and array.dtype.itemsize > 4:
+        # plotly.js has no 64-bit integer arrays
+        array = array.astype(np.int32 if np.abs(array).max(initial=0) < 2 ** 31 else np.float64)
+    elif array.dtype == np.float64 and np.array_equal(array, array.astype(np.float32), equal_nan=True):
+        array = array.astype(np.float32)
+    array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+    spec = {"dtype": array.dtype.str[1:], "bdata": base64.b64encode(array.tobytes()).decode("ascii")}
+    if array.ndim > 1:
+        spec["shape"] = ",".join(str(n) for n in array.shape)
+    return spec
+
+
+def compact_figure(fig):
+    """Return a copy of ``fig`` with numeric trace arrays sent as typed arrays.
+
+    Each array keeps whichever encoding is shorter, so short lists of round
+    numbers such as threshold levels stay plain JSON.
+
+    Plotly.py 5 validators reject typed-array specs, so the copy is built
+    without validation; it is only meant for display, not further editing.
+    """
+    if fig is None:
+        return None
+    spec = fig.to_plotly_json()
+    for trace in spec["data"]:
+        for prop in TYPED_ARRAY_PROPERTIES:
+            values = trace.get(prop)
+            if values is None or isinstance(values, (str, dict)):
+                continue
+            array = np.asarray(values)
+            if array.size and array.dtype.kind in "biuf":
+                typed = _typed_array(array)
+                # Sized with the encoder Streamlit uses, which escapes every
+                # "/" in the base64 data
+                if len(pio.json.to_json_plotly(typed)) < len(pio.json.to_json_plotly(array)):
+                    trace[prop] = typed
+    return go.Figure(spec, _validate=False)
+
+
+def payload_size(fig):
+    """Return the size in bytes of the JSON sent to the browser for ``fig``."""
+    return len(pio.to_json(fig, validate=False).encode("utf-8")) if fig is not None else 0
@@ -0,0 +1,131 @@
+"""Samples x analytes comparison of many scored samples.
+
+Samples arrive as a long table (one row per sample/analyte reading) and are
+scored in a single vectorized pass, then pivoted into a samples x analytes
+matrix of status, concentration or multiplier. Analyte and status are stored
+as categoricals to keep large batches (10,000 samples x 33 analytes) light in
+memory. Concentrations and pH are read and classified as float64, so a
+reading exactly at a threshold scores as it does for a single sample; only
+the displayed matrix values are downcast to float32.
+"""
+import numpy as np
+import pandas as pd
+
+from thresholds import DEFAULT_PH, STATUS_DTYPE, STATUS_ORDER, build_result, classify_frame, thresholds_for_ph
+
+MATRIX_VALUES = {
+    "Status": "status",
+    "Concentration (mg/L)": "concentration",
+    "Action Multiplier": "times_threshold",
+    "Escalation Multiplier": "times_escalation"
+}
+
+
+def read_samples_csv(source):
+    """Read a long-format samples CSV.
+
+    Requires sample, analyte and concentration columns; an optional ph
+    column carries each sample's measured pH, an optional site column the
+    sampling site and an optional unit column each concentration's unit
+    (see ``units.normalize_units``).
+    """
+    df = pd.read_csv(
+        source,
+        usecols=lambda column: column in {"sample", "analyte", "concentration", "ph", "site", "unit"},
+        dtype={
+            "sample": "category", "analyte": "category", "concentration": "float64",
+            "ph": "float64", "site": "category", "unit": "category"
+        }
+    )
+    missing = {"sample", "analyte", "concentration"} - set(df.columns)
+    if missing:
+        raise ValueError(f"missing column(s): {', '.join(sorted(missing))}")
+    return df.dropna(subset=["sample", "analyte", "concentration"])
+
+
+def score_samples(samples, default_ph=DEFAULT_PH):
+    """Score a long samples frame against the pH-dependent thresholds.
+
+    Each row is scored at its own ``ph`` (or ``default_ph`` when the frame
+    has no pH), so mixed-pH batches are classified in one pass. Returns the
+    scored frame and the sorted list of analytes that are unknown or not
+    defined at their sample's pH (rows for those are dropped).
+    """
+    classified = classify_frame(samples, default_ph)
+    known = classified["status"].notna()
+    unknown = sorted(samples.loc[~known, "analyte"].astype(str).unique().tolist())
+
+    classified = classified[known]
+    concentration = samples.loc[known, "concentration"].to_numpy(dtype=np.float64)
+    scored = pd.DataFrame({
+        "sample": samples.loc[known, "sample"].astype("category"),
+        "analyte": classified["analyte"],
+        "ph": classified["ph"],
+        "concentration": concentration,
+        "status": classified["status"],
+        "times_threshold": concentration / classified["action_level"].to_numpy(),
+        "times_escalation": concentration / classified["escalation_level"].to_numpy()
+    })
+    if "site" in samples:
+        scored.insert(0, "site", samples.loc[known, "site"].astype("category"))
+    return scored, unknown
+
+
+def build_matrix(scored, value="status"):
+    """Pivot a scored frame into a samples x analytes matrix of ``value``.
+
+    The matrix is indexed by sample and carries a leading ``Worst Status``
+    column, ordered safe < action < escalation.
+    """
+    if value == "status":
+        # Pivot the integer codes, then restore the categorical per column
+        codes = scored.assign(status=scored["status"].cat.codes.astype(np.int8))
+        matrix = codes.pivot_table(
+            index="sample", columns="analyte", values="status",
+            aggfunc="max", observed=True
+        )
+        matrix = matrix.apply(
+            lambda col: pd.Categorical.from_codes(col.fillna(-1).astype(np.int8), dtype=STATUS_DTYPE)
+        )
+    else:
+        matrix = scored.pivot_table(
+            index="sample", columns="analyte", values=value,
+            aggfunc="max", observed=True
+        ).astype(np.float32)
+
+    matrix.columns = matrix.columns.astype(str)
+    worst = scored.groupby("sample", observed=True)["status"].max()
+    matrix.insert(0, "Worst Status", worst.reindex(matrix.index))
+    return matrix
+
+
+def filter_by_worst_status(matrix, min_status="safe", descending=True):
+    """Keep samples whose worst status is at least ``min_status``, worst first."""
+    worst = matrix["Worst Status"]
+    filtered = matrix[worst >= min_status]
+    return filtered.sort_values(
+        "Worst Status", ascending=not descending, kind="stable"
+    )
+
+
+def worst_status_counts(matrix):
+    """Return the number of samples at each worst status."""
+    return matrix["Worst Status"].value_counts().reindex(STATUS_ORDER, fill_value=0)
+
+
+def worst_readings_by_site(scored):
+    """Return ``{site: results}`` holding each analyte's worst reading per site.
+
+    The results are dicts shaped like the single-sample results, so a site's
+    worst case can be rendered as a regular report.
+    """
+    worst = scored.loc[
+        scored.groupby(["site", "analyte"], observed=True)["times_escalation"].idxmax()
+    ]
+    reports = {}
+    for row in worst.itertuples(index=False):
+        data = thresholds_for_ph(float(row.ph))[row.analyte]
+        result = build_result(row.analyte, float(row.concentration), data)
+        result["sample"] = row.sample
+        reports.setdefault(row.site, []).append(result)
+    return reports
@@ -0,0 +1,393 @@
+"""Compliance report export.
+
+Renders the summary counts, overall status banner, heatmap, bar chart and
+detailed result cards of an analysis to a self-contained HTML file, a PDF
+and an XLSX workbook. ``ReportExporter`` renders in a background thread
+pool and caches artifacts by results hash, so repeated downloads of the
+same analysis are served from memory and per-site batches render in
+parallel.
+"""
+import hashlib
+import html
+import io
+import json
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from charts import create_bar_chart, create_heatmap
+from theme import (
+    DARK_GREY, LIGHT_GREY, PRIMARY_GREEN, SECONDARY_GREEN, STATUS_GREEN, STATUS_ORANGE,
+    STATUS_RED, TEXT_BLACK, get_status_color
+)
+
+REPORT_FORMATS = {
+    "html": "text/html",
+    "pdf": "application/pdf",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+}
+
+BANNERS = {
+    "escalation": (
+        "#ffebee", STATUS_RED, "CRITICAL: Production Should Be Stopped",
+        "One or more analytes have reached escalation levels. Green hydrogen production should be halted "
+        "until wastewater treatment addresses these concentrations."
+    ),
+    "action": (
+        "#fff3e0", STATUS_ORANGE, "CAUTION: Action Required",
+        "One or more analytes have reached action levels. Monitor closely and consider treatment "
+        "to prevent escalation."
+    ),
+    "safe": (
+        "#e8f5e9", STATUS_GREEN, "ALL CLEAR: Safe for Production",
+        "All analytes are within safe limits. Your wastewater is suitable for green hydrogen production."
+    )
+}
+
+CARD_STYLES = {
+    "safe": ("status-safe", "OK"),
+    "action": ("status-action", "!"),
+    "escalation": ("status-escalation", "X")
+}
+
+REPORT_CSS = f"""
+body {{ font-family: 'Hind', sans-serif; background-color: white; color: {TEXT_BLACK}; max-width: 1200px; margin: 0 auto; padding: 20px; }}
+h1 {{ color: {PRIMARY_GREEN}; background-color: {DARK_GREY}; padding: 20px 30px; border-radius: 10px; }}
+h3 {{ color: {SECONDARY_GREEN}; }}
+.summary {{ display: flex; gap: 20px; }}
+.summary > div {{ flex: 1; }}
+.status-card {{ padding: 15px; border-radius: 8px; margin: 10px 0; color: {TEXT_BLACK}; }}
+.status-safe {{ background-color: #e8f5e9; border-left: 5px solid {STATUS_GREEN}; }}
+.status-action {{ background-color: #fff3e0; border-left: 5px solid {STATUS_ORANGE}; }}
+.status-escalation {{ background-color: #ffebee; border-left: 5px solid {STATUS_RED}; }}
+"""
+
+
+def results_hash(results, site=None):
+    """Return a stable hash of a list of results dicts."""
+    payload = json.dumps([site, results], sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def status_counts(results):
+    """Return total, safe, action and escalation counts for a list of results."""
+    counts = {"total": len(results), "safe": 0, "action": 0, "escalation": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    return counts
+
+
+def overall_status(counts):
+    """Return the worst status present in ``counts``."""
+    if counts["escalation"] > 0:
+        return "escalation"
+    elif counts["action"] > 0:
+        return "action"
+    else:
+        return "safe"
+
+
+def summary_card_html(label, count, color):
+    """Return the HTML for one summary count card."""
+    return f"""
+    <div style='background-color:white; padding:20px; border-radius:10px; text-align:center; box-shadow: 0 2px 4px rgba(0,0,0,0.1);'>
+        <p style='color:{TEXT_BLACK}; margin:0; font-family:Hind;'>{label}</p>
+        <p style='font-size:36px; font-weight:bold; color:{color}; margin:0; font-family:Hind;'>{count}</p>
+    </div>
+    """
+
+
+def summary_cards(counts):
+    """Return (label, count, color) for the four summary cards."""
+    return [
+        ("Total Analytes", counts["total"], DARK_GREY),
+        ("Safe", counts["safe"], STATUS_GREEN),
+        ("Action Level", counts["action"], STATUS_ORANGE),
+        ("Escalation Level", counts["escalation"], STATUS_RED)
+    ]
+
+
+def status_banner_html(counts):
+    """Return the HTML for the overall status banner."""
+    background, color, title, text = BANNERS[overall_status(counts)]
+    return f"""
+    <div style='background-color:{background}; padding:20px; border-radius:10px; border-left:5px solid {color}; margin-bottom:20px;'>
+        <h3 style='color:{color}; margin:0 0 10px 0; font-family:Hind;'>{title}</h3>
+        <p style='margin:0; font-family:Hind; color:{DARK_GREY};'>
+            {text}
+        </p>
+    </div>
+    """
+
+
+def anomaly_notice_html(count, where):
+    """Return the HTML for the notice shown when readings are out of family for ``where``."""
+    return f"""
+    <div style='background-color:#fff8e1; padding:15px 20px; border-radius:10px; border-left:5px solid {STATUS_ORANGE}; margin-bottom:20px;'>
+        <h4 style='color:{STATUS_ORANGE}; margin:0 0 5px 0; font-family:Hind;'>Possible Sampling or Lab Error</h4>
+        <p style='margin:0; font-family:Hind; color:{DARK_GREY};'>
+            {count} reading(s) are out of family for {html.escape(where)}. Check these values with the lab before acting on them.
+        </p>
+    </div>
+    """
+
+
+def result_card_html(result):
+    """Return the HTML for one detailed result card."""
+    status = result["status"]
+    card_class, icon = CARD_STYLES[status]
+
+    anomaly_note = ""
+    if result.get("anomaly"):
+        anomaly_note = f"<p style='margin:10px 0 0 0; font-family:Hind; color:{STATUS_ORANGE};'><strong>Anomaly:</strong> {html.escape(str(result['anomaly_reason']))}</p>"
+
+    return f"""
+    <div class='status-card {card_class}'>
+        <div style='display:flex; justify-content:space-between; align-items:flex-start;'>
+            <div>
+                <h4 style='margin:0 0 5px 0; color:{DARK_GREY}; font-family:Hind;'>{html.escape(result["analyte"])}</h4>
+                <p style='margin:0; font-family:Hind;'>
+                    <strong>Your Concentration:</strong> {result["concentration"]:.6f} mg/L |
+                    <strong>Action Level:</strong> {result["action_level"]:.4f} mg/L |
+                    <strong>Escalation Level:</strong> {result["escalation_level"]:.4f} mg/L
+                </p>
+                <p style='margin:10px 0 0 0; font-family:Hind; font-style:italic;'>{html.escape(result["message"])}</p>
+                {anomaly_note}
+            </div>
+            <div style='font-size:24px; font-weight:bold; color:{get_status_color(status)};'>{icon}</div>
+        </div>
+    </div>
+    """
+
+
+def _report_title(site):
+    return f"Electrolyser Wastewater Analysis - {site}" if site else "Electrolyser Wastewater Analysis"
+
+
+def _figures(results):
+    results_df = pd.DataFrame(results)
+    return [fig for fig in (create_heatmap(results_df), create_bar_chart(results_df)) if fig]
+
+
+def render_html(results, site=None):
+    """Render a self-contained HTML report (plotly.js is embedded inline)."""
+    counts = status_counts(results)
+    generated = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+
+    charts = []
+    for i, fig in enumerate(_figures(results)):
+        charts.append(fig.to_html(full_html=False, include_plotlyjs=(i == 0)))
+
+    summary = "".join(f"<div>{summary_card_html(*card)}</div>" for card in summary_cards(counts))
+    cards = "".join(result_card_html(result) for result in results)
+    title = html.escape(_report_title(site))
+
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>{REPORT_CSS}</style>
+</head>
+<body>
+<h1>{title}</h1>
+<p style='color:{LIGHT_GREY};'>Generated {generated}</p>
+<div class='summary'>{summary}</div>
+<br>
+{status_banner_html(counts)}
+<h3>Visualizations</h3>
+{"".join(charts)}
+<h3>Detailed Results</h3>
+{cards}
+<p style='text-align:center; color:{LIGHT_GREY};'>HydroStar Europe Ltd.</p>
+</body>
+</html>
+"""
+
+
+def render_pdf(results, site=None):
+    """Render a PDF report; charts are embedded as static images."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    counts = status_counts(results)
+    styles = getSampleStyleSheet()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, title=_report_title(site))
+    width = doc.width
+
+    story = [Paragraph(html.escape(_report_title(site)), styles["Title"])]
+
+    summary = Table(
+        [[label for label, _, _ in summary_cards(counts)], [str(count) for _, count, _ in summary_cards(counts)]],
+        colWidths=[width / 4] * 4
+    )
+    summary.setStyle(TableStyle([
+        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+        ("FONTSIZE", (0, 1), (-1, 1), 20),
+        ("TOPPADDING", (0, 1), (-1, 1), 8),
+        ("BOTTOMPADDING", (0, 1), (-1, 1), 8),
+        *[("TEXTCOLOR", (i, 1), (i, 1), colors.HexColor(color)) for i, (_, _, color) in enumerate(summary_cards(counts))]
+    ]))
+    story += [summary, Spacer(1, 0.5 * cm)]
+
+    background, color, title, text = BANNERS[overall_status(counts)]
+    banner = Table([[Paragraph(f"<b>{title}</b>", styles["Heading3"])], [Paragraph(text, styles["BodyText"])]], colWidths=[width])
+    banner.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, -1), colors.HexColor(background)),
+        ("LINEBEFORE", (0, 0), (0, -1), 5, colors.HexColor(color)),
+        ("TEXTCOLOR", (0, 0), (0, 0), colors.HexColor(color))
+    ]))
+    story += [banner, Spacer(1, 0.5 * cm)]
+
+    for fig in _figures(results):
+        png = fig.to_image(format="png", width=1100, height=fig.layout.height or 400, scale=1)
+        image = Image(io.BytesIO(png))
+        image.drawWidth, image.drawHeight = width, width * image.imageHeight / image.imageWidth
+        story += [image, Spacer(1, 0.3 * cm)]
+
+    story.append(Paragraph("Detailed Results", styles["Heading2"]))
+    for result in results:
+        card = Table([
+            [Paragraph(f"<b>{html.escape(result['analyte'])}</b> - {result['status_label']}", styles["Heading4"])],
+            [Paragraph(
+                f"Your Concentration: {result['concentration']:.6f} mg/L | "
+                f"Action Level: {result['action_level']:.4f} mg/L | "
+                f"Escalation Level: {result['escalation_level']:.4f} mg/L",
+                styles["BodyText"]
+            )],
+            [Paragraph(f"<i>{html.escape(result['message'])}</i>", styles["BodyText"])]
+        ], colWidths=[width])
+        card.setStyle(TableStyle([
+            ("BACKGROUND", (0, 0), (-1, -1), colors.HexColor(BANNERS[result["status"]][0])),
+            ("LINEBEFORE", (0, 0), (0, -1), 5, colors.HexColor(get_status_color(result["status"])))
+        ]))
+        story += [card, Spacer(1, 0.2 * cm)]
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def render_xlsx(results, site=None):
+    """Render an XLSX workbook with Summary, Results and Charts sheets."""
+    from openpyxl.drawing.image import Image
+    from openpyxl.styles import Font, PatternFill
+
+    counts = status_counts(results)
+    summary = pd.DataFrame(
+        [(label, count) for label, count, _ in summary_cards(counts)]
+        + [("Overall Status", BANNERS[overall_status(counts)][2])],
+        columns=["Metric", "Value"]
+    )
+    columns = [
+        "analyte", "concentration", "action_level", "escalation_level", "status_label",
+        "times_threshold", "times_escalation", "message", "anomaly", "anomaly_reason"
+    ]
+    results_df = pd.DataFrame(results).reindex(columns=columns)
+
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        summary.to_excel(writer, sheet_name="Summary", index=False)
+        results_df.to_excel(writer, sheet_name="Results", index=False)
+
+        sheet = writer.sheets["Summary"]
+        sheet.insert_rows(1, 2)
+        sheet["A1"] = _report_title(site)
+        sheet["A1"].font = Font(bold=True, size=14)
+        sheet.column_dimensions["A"].width = 20
+        sheet.column_dimensions["B"].width = 40
+
+        sheet = writer.sheets["Results"]
+        sheet.column_dimensions["A"].width = 28
+        for row, result in enumerate(results, start=2):
+            color = get_status_color(result["status"]).lstrip("#")
+            sheet.cell(row=row, column=5).fill = PatternFill("solid", fgColor=color)
+
+        sheet = writer.book.create_sheet("Charts")
+        anchor_row = 1
+        for fig in _figures(results):
+            height = fig.layout.height or 400
+            image = Image(io.BytesIO(fig.to_image(format="png", width=1100, height=height, scale=1)))
+            sheet.add_image(image, f"A{anchor_row}")
+            anchor_row += height // 20 + 2
+
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    "html": lambda results, site: render_html(results, site).encode("utf-8"),
+    "pdf": render_pdf,
+    "xlsx": render_xlsx
+}
+
+
+def _archive_name(site, used):
+    """Return a ZIP entry stem for ``site`` that is a plain, unused file name."""
+    stem = re.sub(r"[^\w .-]", "_", str(site)).strip(" .") or "site"
+    name, n = stem, 2
+    while name.lower() in used:
+        name, n = f"{stem} ({n})", n + 1
+    used.add(name.lower())
+    return name
+
+
+def zip_reports(reports_by_site, fmt):
+    """Return a ZIP of ``{site: report bytes}``, one ``<site>.<fmt>`` file per site.
+
+    Site names are reduced to safe file names, so a name like ``Plant A/1``
+    cannot create a folder or escape the archive.
+    """
+    buffer = io.BytesIO()
+    used = set()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for site, report in reports_by_site.items():
+            zf.writestr(f"{_archive_name(site, used)}.{fmt}", report)
+    return buffer.getvalue()
+
+
+class ReportExporter:
+    """Render reports in a background thread pool with an LRU artifact cache."""
+
+    def __init__(self, max_workers=4, max_cached=64):
+        self.max_cached = max_cached
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report")
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, results, fmt, site=None, key=None):
+        """Return a future for the report bytes, reusing a cached render.
+
+        ``key`` identifies the results (it defaults to ``results_hash``), so
+        the same analysis in the same format is only ever rendered once
+        while it stays in the cache.
+        """
+        cache_key = (key or results_hash(results, site), fmt, site)
+        with self._lock:
+            future = self._cache.get(cache_key)
+            if future is not None:
+                self._cache.move_to_end(cache_key)
+                return future
+            future = self._executor.submit(RENDERERS[fmt], results, site)
+            self._cache[cache_key] = future
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        future.add_done_callback(lambda f: self._discard_failed(cache_key, f))
+        return future
+
+    def _discard_failed(self, cache_key, future):
+        if future.exception() is not None:
+            with self._lock:
+                if self._cache.get(cache_key) is future:
+                    del self._cache[cache_key]
+
+    def export_batch(self, results_by_site, fmt):
+        """Render one report per site in parallel; returns {site: future}."""
+        return {site: self.submit(results, fmt, site=site) for site, results in results_by_site.items()}
@@ -0,0 +1,87 @@
+"""Content-hashed index of analysed samples.
+
+Each sample is hashed on a canonical form of its site, analyte/concentration
+set and the version of the threshold table it was scored against. The index
+is an append-only JSON lines file loaded into a dict, so a resent sample is
+recognised in O(1) and its stored results reused instead of recomputed.
+"""
+import hashlib
+import json
+import os
+import threading
+
+
+def threshold_version(data):
+    """Return a short stable hash identifying a threshold table."""
+    payload = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def sample_hash(entries, version, site=""):
+    """Return the content hash of a sample.
+
+    ``entries`` is an iterable of ``{"analyte", "concentration"}`` dicts. Entry
+    order does not matter and concentrations are canonicalised through
+    ``float`` so ``5``, ``5.0`` and ``5.000000`` hash the same.
+    """
+    canonical = sorted((e["analyte"], repr(float(e["concentration"]))) for e in entries)
+    payload = json.dumps([site, version, canonical], separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SampleIndex:
+    """Persistent mapping of sample hash to stored results."""
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                try:
+                    json.loads(data[end:])
+                    # A complete record that only lacks its newline
+                    f.write(b"\n")
+                    end = len(data)
+                except json.JSONDecodeError:
+                    # A truncated final line from an interrupted write; drop it
+                    # so the next append starts on a fresh line
+                    f.truncate(end)
+        for line in data[:end].splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            self._entries[record["hash"]] = record["results"]
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the stored results for ``key``, or None."""
+        return self._entries.get(key)
+
+    def put(self, key, results):
+        """Store results under ``key`` and append them to the index file."""
+        with self._lock:
+            if key in self._entries:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"hash": key, "results": results}) + "\n")
+            self._entries[key] = results
@@ -0,0 +1,462 @@
+"""Local HTTP scoring service.
+
+Exposes the same thresholds and status logic as the dashboard so SCADA
+historians and LIMS can push samples programmatically::
+
+    python service.py --host 127.0.0.1 --port 8080
+
+Endpoints:
+
+* ``POST /score`` - one sample as JSON, returns one scored sample.
+* ``POST /score/batch`` - many samples, either as a JSON body
+  ``{"samples": [...]}`` or as NDJSON (one sample per line). The response
+  is streamed as NDJSON, one scored sample per line, or as a JSON
+  ``{"samples": [...]}`` document when ``format=json`` is passed. Samples
+  are scored and written in slices of ``STREAM_CHUNK``; an invalid sample
+  after the first slice ends the stream with an ``error`` entry.
+* ``GET /thresholds?ph=7.0`` - the threshold table at a pH.
+* ``GET /health``
+
+A sample looks like ``{"id": "S1", "site": "Plant A", "ph": 7.2,
+"readings": [{"analyte": "Chloride (Cl-)", "concentration": 12.0}]}``;
+``id``, ``site`` and ``ph`` are optional; ``ph`` must be within 0-14 and
+concentrations must be finite and non-negative. A sample with no readings,
+or with a reading that could not be scored (unknown analyte or unit), is
+never reported as safe: its ``overall_status`` is ``"incomplete"`` unless
+another reading reached the action or escalation level. A reading
+may carry a ``unit``
+(``"ug/L"``, ``"mmol/L"``, ``"mg/L as CaCO3"``...; mg/L when omitted) and
+is scored, and returned, in mg/L. All readings of a batch are normalized
+and classified in one vectorized pass, then fed to the alert engine and the
+anomaly detector; scored readings carry ``anomaly`` and ``anomaly_reason``.
+"""
+import argparse
+import asyncio
+import http.client
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import orjson
+import pandas as pd
+from aiohttp import web
+
+from alerts import AlertEngine, FileSink, StdoutSink, WebhookSink
+from anomaly import RobustAnomalyDetector
+from thresholds import (
+    DEFAULT_PH, STATUS_ORDER, canonical_analyte, classify_frame, get_status, thresholds_for_ph
+)
+from units import unit_factor, unit_factors
+
+# Requests with at most this many readings skip the vectorized path, whose
+# fixed DataFrame overhead dominates for a single sample
+SCALAR_THRESHOLD = 64
+# Batches with more readings than this are scored off the event loop
+EXECUTOR_THRESHOLD = 2000
+# Scored samples per streamed response chunk
+STREAM_CHUNK = 500
+
+NDJSON = "application/x-ndjson"
+
+NO_THRESHOLDS = "No thresholds for this analyte at the sample pH"
+
+# Site used for alert state when a sample does not name one
+DEFAULT_SITE = "Default Site"
+
+PH_MIN = 0.0
+PH_MAX = 14.0
+INCOMPLETE = "incomplete"
+
+
+def parse_ph(value, default_ph=DEFAULT_PH):
+    """Return ``value`` as a pH, raising ValueError unless it is a finite number within 0-14."""
+    ph = default_ph if value is None else float(value)
+    # NaN fails both comparisons
+    if not PH_MIN <= ph <= PH_MAX:
+        raise ValueError(f"ph must be a number between {PH_MIN:g} and {PH_MAX:g}, got {value!r}")
+    return ph
+
+
+class InvalidSample(ValueError):
+    """A sample that cannot be scored; ``index`` is its position in the request."""
+
+    def __init__(self, index, error):
+        super().__init__(str(error))
+        self.index = index
+
+
+def parse_concentration(value):
+    """Return ``value`` as a concentration, raising ValueError unless it is finite and non-negative."""
+    concentration = float(value)
+    # NaN fails the comparison, infinity the isfinite check
+    if not (concentration >= 0 and np.isfinite(concentration)):
+        raise ValueError(f"concentration must be a finite, non-negative number, got {value!r}")
+    return concentration
+
+
+def _overall_status(worst, unscored):
+    return INCOMPLETE if unscored and worst == 0 else STATUS_ORDER[worst]
+
+
+def _unknown_unit(analyte, concentration, unit):
+    return {
+        "analyte": analyte,
+        "concentration": concentration,
+        "status": None,
+        "error": f"Unit {unit!r} cannot be converted to mg/L for this analyte"
+    }
+
+
+def _score_reading(reading, data):
+    analyte = reading["analyte"]
+    concentration = parse_concentration(reading["concentration"])
+    factor = unit_factor(analyte, reading.get("unit"))
+    if np.isnan(factor):
+        return _unknown_unit(analyte, concentration, reading.get("unit"))
+    concentration *= factor
+    entry = data.get(canonical_analyte(analyte))
+    if entry is None:
+        return {
+            "analyte": analyte,
+            "concentration": concentration,
+            "status": None,
+            "error": NO_THRESHOLDS
+        }
+    return {
+        "analyte": analyte,
+        "concentration": concentration,
+        "action_level": entry["action_level"],
+        "escalation_level": entry["escalation_level"],
+        "status": get_status(concentration, entry["action_level"], entry["escalation_level"]),
+        "times_threshold": concentration / entry["action_level"],
+        "times_escalation": concentration / entry["escalation_level"]
+    }
+
+
+def _score_samples_scalar(samples, default_ph):
+    scored = []
+    for i, sample in enumerate(samples):
+        try:
+            ph = parse_ph(sample.get("ph"), default_ph)
+            data = thresholds_for_ph(ph)
+            results = [_score_reading(reading, data) for reading in sample.get("readings", ())]
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise InvalidSample(i, e) from e
+        worst = max((STATUS_ORDER.index(r["status"]) for r in results if r["status"]), default=0)
+        unscored = not results or any(r["status"] is None for r in results)
+        scored.append({
+            "id": sample.get("id"),
+            "site": sample.get("site"),
+            "ph": ph,
+            "overall_status": _overall_status(worst, unscored),
+            "results": results
+        })
+    return scored
+
+
+def score_samples(samples, default_ph=DEFAULT_PH):
+    """Score a list of sample dicts and return a list of scored sample dicts.
+
+    Raises InvalidSample for the first sample that cannot be scored.
+    """
+    if sum(len(sample.get("readings", ())) for sample in samples) <= SCALAR_THRESHOLD:
+        return _score_samples_scalar(samples, default_ph)
+
+    sample_index, analytes, concentrations, units, phs, sample_phs = [], [], [], [], [], []
+    for i, sample in enumerate(samples):
+        try:
+            ph = parse_ph(sample.get("ph"), default_ph)
+            rows = [
+                (reading["analyte"], parse_concentration(reading["concentration"]), reading.get("unit"))
+                for reading in sample.get("readings", ())
+            ]
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise InvalidSample(i, e) from e
+        sample_phs.append(ph)
+        for analyte, concentration, unit in rows:
+            sample_index.append(i)
+            analytes.append(analyte)
+            concentrations.append(concentration)
+            units.append(unit)
+            phs.append(ph)
+
+    factors = unit_factors(analytes, units)
+    reported = np.asarray(concentrations)
+    concentration = reported * factors
+    readings = pd.DataFrame({"analyte": analytes, "concentration": concentration, "ph": phs})
+    classified = classify_frame(readings, default_ph)
+
+    action = classified["action_level"].to_numpy()
+    escalation = classified["escalation_level"].to_numpy()
+    with np.errstate(invalid="ignore"):
+        times_threshold = (concentration / action).tolist()
+        times_escalation = (concentration / escalation).tolist()
+    # Unconvertible units are reported like unknown analytes, with code -2
+    status_codes = np.where(np.isnan(factors), -2, classified["status"].cat.codes.to_numpy()).astype(np.int8)
+    sample_index = np.asarray(sample_index, dtype=np.intp)
+    worst = np.zeros(len(samples), dtype=np.int8)
+    np.maximum.at(worst, sample_index, status_codes)
+    # Samples without readings are unscored too
+    unscored = (np.bincount(sample_index[status_codes < 0], minlength=len(samples)) > 0) | (
+        np.bincount(sample_index, minlength=len(samples)) == 0
+    )
+    sample_index = sample_index.tolist()
+    status_codes = status_codes.tolist()
+    concentrations = concentration.tolist()
+    action = action.tolist()
+    escalation = escalation.tolist()
+
+    scored = [
+        {
+            "id": sample.get("id"),
+            "site": sample.get("site"),
+            "ph": ph,
+            "overall_status": _overall_status(code, missing),
+            "results": []
+        }
+        for sample, ph, code, missing in zip(samples, sample_phs, worst.tolist(), unscored.tolist())
+    ]
+    for row, i in enumerate(sample_index):
+        code = status_codes[row]
+        if code == -2:
+            scored[i]["results"].append(_unknown_unit(analytes[row], float(reported[row]), units[row]))
+        elif code < 0:
+            scored[i]["results"].append({
+                "analyte": analytes[row],
+                "concentration": concentrations[row],
+                "status": None,
+                "error": NO_THRESHOLDS
+            })
+        else:
+            scored[i]["results"].append({
+                "analyte": analytes[row],
+                "concentration": concentrations[row],
+                "action_level": action[row],
+                "escalation_level": escalation[row],
+                "status": STATUS_ORDER[code],
+                "times_threshold": times_threshold[row],
+                "times_escalation": times_escalation[row]
+            })
+    return scored
+
+
+def _monitor(scored, engine, detector):
+    """Feed the scored readings, in order, to the alert engine and the anomaly detector."""
+    results, sites = [], []
+    for sample in scored:
+        site = sample["site"] or DEFAULT_SITE
+        for result in sample["results"]:
+            if result["status"] is None:
+                continue
+            results.append(result)
+            sites.append(site)
+    if not results:
+        return
+    readings = pd.DataFrame({
+        "site": sites,
+        "analyte": [result["analyte"] for result in results],
+        "concentration": [result["concentration"] for result in results],
+        "action_level": [result["action_level"] for result in results],
+        "escalation_level": [result["escalation_level"] for result in results]
+    })
+    engine.evaluate(readings)
+    anomalies = detector.observe(readings)
+    for result, anomaly, reason in zip(results, anomalies["anomaly"].tolist(), anomalies["anomaly_reason"].tolist()):
+        result["anomaly"] = anomaly
+        result["anomaly_reason"] = reason
+
+
+def _score_and_monitor(samples, engine, detector):
+    scored = score_samples(samples)
+    _monitor(scored, engine, detector)
+    return scored
+
+
+async def _score(request, samples):
+    """Score samples, evaluate alerts and flag anomalies, moving large batches off the event loop."""
+    reading_count = sum(len(sample.get("readings", ())) for sample in samples)
+    if reading_count <= EXECUTOR_THRESHOLD:
+        return _score_and_monitor(samples, request.app["alerts"], request.app["anomalies"])
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        request.app["executor"], _score_and_monitor, samples, request.app["alerts"], request.app["anomalies"]
+    )
+
+
+def _json_response(data, status=200):
+    return web.json_response(data, status=status, dumps=lambda obj: orjson.dumps(obj).decode("utf-8"))
+
+
+def _invalid(message):
+    return _json_response({"error": message}, status=400)
+
+
+async def handle_score(request):
+    try:
+        sample = orjson.loads(await request.read())
+        scored = await _score(request, [sample])
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        return _invalid(f"Invalid sample: {e}")
+    return _json_response(scored[0])
+
+
+async def _read_samples(request):
+    body = await request.read()
+    if request.content_type == NDJSON:
+        return [orjson.loads(line) for line in body.splitlines() if line.strip()]
+    return orjson.loads(body)["samples"]
+
+
+def _encode_chunk(scored, as_json, first):
+    if as_json:
+        return (b"" if first else b",") + b",".join(orjson.dumps(s) for s in scored)
+    return b"".join(orjson.dumps(s, option=orjson.OPT_APPEND_NEWLINE) for s in scored)
+
+
+async def handle_score_batch(request):
+    # The first slice is scored before the response starts, so a malformed
+    # batch usually still gets a 400
+    try:
+        samples = await _read_samples(request)
+        scored = await _score(request, samples[:STREAM_CHUNK])
+    except InvalidSample as e:
+        return _invalid(f"Invalid batch at sample {e.index}: {e}")
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        return _invalid(f"Invalid batch: {e}")
+
+    as_json = request.query.get("format") == "json"
+    response = web.StreamResponse(headers={"Content-Type": "application/json" if as_json else NDJSON})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+
+    if as_json:
+        await response.write(b'{"samples":[')
+    # Each slice is written as soon as it is scored
+    for start in range(0, len(samples), STREAM_CHUNK):
+        if start:
+            try:
+                scored = await _score(request, samples[start:start + STREAM_CHUNK])
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                # The status line has been sent; report the error in-band and stop
+                index = start + e.index if isinstance(e, InvalidSample) else start
+                error = f"Invalid batch at sample {index}: {e}"
+                if as_json:
+                    await response.write(b'],"error":' + orjson.dumps(error) + b"}")
+                else:
+                    await response.write(orjson.dumps({"error": error}, option=orjson.OPT_APPEND_NEWLINE))
+                await response.write_eof()
+                return response
+        await response.write(_encode_chunk(scored, as_json, first=start == 0))
+    if as_json:
+        await response.write(b"]}")
+    await response.write_eof()
+    return response
+
+
+async def handle_thresholds(request):
+    try:
+        ph = parse_ph(request.query.get("ph"))
+    except ValueError as e:
+        return _invalid(str(e))
+    return _json_response({"ph": ph, "thresholds": thresholds_for_ph(ph)})
+
+
+async def handle_health(request):
+    return _json_response({"status": "ok"})
+
+
+async def _shutdown_executor(app):
+    app["executor"].shutdown(wait=False)
+
+
+def create_app(max_workers=4, client_max_size=64 * 1024 ** 2, alert_engine=None, anomaly_detector=None):
+    """Create the scoring service application.
+
+    Every scored reading is evaluated by ``alert_engine`` (by default one
+    that writes alerts to stdout) and checked by ``anomaly_detector``
+    against the recent history of its site.
+    """
+    app = web.Application(client_max_size=client_max_size)
+    app["alerts"] = alert_engine if alert_engine is not None else AlertEngine()
+    app["anomalies"] = anomaly_detector if anomaly_detector is not None else RobustAnomalyDetector()
+    app["executor"] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="score")
+    app.on_cleanup.append(_shutdown_executor)
+    app.router.add_post("/score", handle_score)
+    app.router.add_post("/score/batch", handle_score_batch)
+    app.router.add_get("/thresholds", handle_thresholds)
+    app.router.add_get("/health", handle_health)
+    return app
+
+
+class ScoringClient:
+    """Keep-alive client for the scoring service.
+
+    One connection is reused for every request, so high-rate callers do not
+    pay a TCP handshake per sample.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8080, timeout=30):
+        self._conn = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _request(self, method, path, body=None, content_type="application/json"):
+        headers = {"Connection": "keep-alive"}
+        if body is not None:
+            headers["Content-Type"] = content_type
+        self._conn.request(method, path, body=body, headers=headers)
+        response = self._conn.getresponse()
+        if response.status != 200:
+            detail = response.read().decode("utf-8", "replace")
+            raise RuntimeError(f"Scoring service returned {response.status}: {detail}")
+        return response
+
+    def score(self, sample):
+        """Score one sample."""
+        return orjson.loads(self._request("POST", "/score", orjson.dumps(sample)).read())
+
+    def score_batch(self, samples):
+        """Score many samples, yielding scored samples as they stream back."""
+        body = b"".join(orjson.dumps(sample, option=orjson.OPT_APPEND_NEWLINE) for sample in samples)
+        response = self._request("POST", "/score/batch", body, content_type=NDJSON)
+        for line in response:
+            if line.strip():
+                yield orjson.loads(line)
+
+    def thresholds(self, ph=DEFAULT_PH):
+        """Return the threshold table at ``ph``."""
+        return orjson.loads(self._request("GET", f"/thresholds?ph={ph}").read())["thresholds"]
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HydroStar wastewater scoring service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=4, help="Threads for scoring large batches")
+    parser.add_argument("--alert-file", help="Also append alerts to this JSON lines file")
+    parser.add_argument("--alert-webhook", help="Also POST alerts to this URL")
+    parser.add_argument("--alert-settings", help="JSON file of per-analyte alert setting overrides")
+    args = parser.parse_args()
+
+    sinks = [StdoutSink()]
+    if args.alert_file:
+        sinks.append(FileSink(args.alert_file))
+    if args.alert_webhook:
+        sinks.append(WebhookSink(args.alert_webhook))
+    overrides = None
+    if args.alert_settings:
+        with open(args.alert_settings, encoding="utf-8") as f:
+            overrides = json.load(f)
+    engine = AlertEngine(sinks, overrides=overrides)
+    web.run_app(create_app(max_workers=args.workers, alert_engine=engine), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
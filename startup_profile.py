@@ -0,0 +1,96 @@
+"""Startup-time profiling for the dashboard.
+
+``StartupProfile`` records named phases of the first script run in a
+process (app module imports, page setup, first paint), so time-to-first-paint
+can be tracked across releases. Under ``streamlit run`` Streamlit itself is
+imported before the script starts, so its cost never shows up there; running
+this module directly measures the import cost of each dashboard dependency,
+Streamlit included, in a fresh interpreter::
+
+    python startup_profile.py
+"""
+import os
+import re
+import subprocess
+import sys
+import time
+
+# Dependencies in the order the dashboard can pull them in; the first group
+# is on the first-paint path, the rest are loaded lazily after "Analyze"
+FIRST_PAINT_MODULES = ["streamlit", "numpy", "theme", "thresholds", "sample_index"]
+LAZY_MODULES = [
+    "pandas", "plotly.graph_objects", "charts", "anomaly", "alerts", "comparison",
+    "units", "report", "archive", "pyarrow.dataset"
+]
+
+
+class StartupProfile:
+    """Named timing marks for the first run of the app in this process."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = []
+        self.finished = False
+
+    def mark(self, name):
+        """Record the end of a phase; ignored once the profile is finished."""
+        if not self.finished:
+            self.marks.append((name, time.perf_counter()))
+
+    def finish(self, name="first paint"):
+        """Record the final phase and stop recording."""
+        self.mark(name)
+        self.finished = True
+
+    def phases(self):
+        """Return (phase, seconds) pairs, one per mark."""
+        phases = []
+        previous = self.start
+        for name, at in self.marks:
+            phases.append((name, at - previous))
+            previous = at
+        return phases
+
+    def total(self):
+        return self.marks[-1][1] - self.start if self.marks else 0.0
+
+    def report(self):
+        """Return the phase breakdown as text."""
+        lines = [f"{name:<24}{seconds * 1000:>9.1f} ms" for name, seconds in self.phases()]
+        lines.append(f"{'total':<24}{self.total() * 1000:>9.1f} ms")
+        return "\n".join(lines)
+
+
+# Started when the app first imports this module, which it does before
+# anything else
+APP_PROFILE = StartupProfile()
+
+
+def import_cost(module):
+    """Return the cumulative import time of ``module`` in a fresh interpreter, in seconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        return None
+    # Lines look like "import time:   self [us] | cumulative | imported package"
+    pattern = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)\s*$")
+    for line in reversed(result.stderr.splitlines()):
+        match = pattern.match(line)
+        if match and match.group(2) == module:
+            return int(match.group(1)) / 1e6
+    return None
+
+
+def main():
+    for title, modules in [("First paint", FIRST_PAINT_MODULES), ("Lazy (after Analyze)", LAZY_MODULES)]:
+        print(title)
+        for module in modules:
+            cost = import_cost(module)
+            text = "not installed" if cost is None else f"{cost * 1000:9.1f} ms"
+            print(f"  {module:<24}{text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import pandas as pd
+
+from alerts import AlertEngine
+
+SITE = "Plant A"
+CHLORIDE = "Chloride (Cl-)"
+
+
+def readings(*concentrations):
+    return pd.DataFrame({
+        "site": SITE,
+        "analyte": CHLORIDE,
+        "concentration": list(concentrations),
+        "action_level": 5.0,
+        "escalation_level": 20.0
+    })
+
+
+def levels(alerts):
+    return [alert["level"] for alert in alerts]
+
+
+def engine(**settings):
+    return AlertEngine(sinks=[], background=False, **settings)
+
+
+def test_alternating_escalation_and_action_raises_action():
+    alerts_engine = engine(raise_after=3)
+    alerts = alerts_engine.evaluate(readings(30, 15, 30, 15, 30, 15, 30))
+    assert levels(alerts) == ["action"]
+    assert alerts_engine.level(SITE, CHLORIDE) == "action"
+
+
+def test_escalation_counts_from_its_own_first_reading():
+    alerts = engine(raise_after=3).evaluate(readings(10, 30, 30, 30))
+    assert levels(alerts) == ["action", "escalation"]
+
+
+def test_consecutive_escalation_raises_straight_to_escalation():
+    alerts = engine(raise_after=3).evaluate(readings(30, 30, 30))
+    assert levels(alerts) == ["escalation"]
+    assert alerts[0]["previous_level"] == "safe"
+
+
+def test_raise_after_needs_consecutive_readings():
+    alerts_engine = engine(raise_after=2)
+    assert alerts_engine.evaluate(readings(10, 1, 10, 1)) == []
+    assert levels(alerts_engine.evaluate(readings(10, 10))) == ["action"]
+
+
+def test_state_carries_across_batches():
+    alerts_engine = engine(raise_after=2)
+    assert alerts_engine.evaluate(readings(10)) == []
+    assert levels(alerts_engine.evaluate(readings(10))) == ["action"]
+
+
+def test_hysteresis_holds_the_level_just_below_the_threshold():
+    alerts_engine = engine(hysteresis=0.1, clear_after=1)
+    alerts_engine.evaluate(readings(10))
+    assert alerts_engine.evaluate(readings(4.6)) == []
+    assert alerts_engine.level(SITE, CHLORIDE) == "action"
+
+
+def test_hysteresis_clears_below_the_release_level():
+    alerts_engine = engine(hysteresis=0.1, clear_after=1)
+    alerts_engine.evaluate(readings(10))
+    assert levels(alerts_engine.evaluate(readings(4.4))) == ["safe"]
+
+
+def test_clear_after_needs_consecutive_readings():
+    alerts_engine = engine(clear_after=3)
+    alerts_engine.evaluate(readings(10))
+    assert alerts_engine.evaluate(readings(1, 1, 10, 1, 1)) == []
+    alerts = alerts_engine.evaluate(readings(1))
+    assert levels(alerts) == ["safe"]
+
+
+def test_escalation_clears_to_lowest_reached_level():
+    alerts_engine = engine(clear_after=2)
+    alerts_engine.evaluate(readings(30))
+    alerts = alerts_engine.evaluate(readings(1, 1))
+    assert levels(alerts) == ["safe"]
+    assert alerts[0]["previous_level"] == "escalation"
+
+
+def test_escalation_drops_back_to_action():
+    alerts_engine = engine(clear_after=2)
+    alerts_engine.evaluate(readings(30))
+    alerts = alerts_engine.evaluate(readings(10, 10))
+    assert levels(alerts) == ["action"]
+    assert alerts[0]["message"].startswith("CAUTION: Chloride (Cl-) at Plant A dropped back")
+
+
+def test_overrides_apply_per_analyte():
+    alerts_engine = engine(raise_after=1, overrides={CHLORIDE: {"raise_after": 2}})
+    assert alerts_engine.evaluate(readings(10)) == []
+    assert levels(alerts_engine.evaluate(readings(10))) == ["action"]
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from anomaly import RobustAnomalyDetector
+
+SITE = "Plant A"
+CHLORIDE = "Chloride (Cl-)"
+
+
+def batch(*concentrations, site=SITE):
+    return pd.DataFrame({"site": site, "analyte": CHLORIDE, "concentration": list(concentrations)})
+
+
+@pytest.fixture
+def detector():
+    detector = RobustAnomalyDetector(min_history=5)
+    detector.update(batch(10.0, 11.0, 9.5, 10.5, 10.2, 9.8))
+    return detector
+
+
+def test_zero_is_flagged_without_history():
+    scores = RobustAnomalyDetector().observe(batch(0.0))
+    assert scores["anomaly"].tolist() == [True]
+    assert scores["anomaly_reason"].tolist() == ["Non-positive concentration"]
+
+
+def test_zero_does_not_enter_the_history():
+    detector = RobustAnomalyDetector(min_history=5)
+    detector.update(batch(10.0, 10.0, 10.0, 10.0))
+    detector.observe(batch(0.0, 0.0))
+    assert detector.score(batch(1000.0))["robust_z"].isna().all()
+
+
+@pytest.mark.parametrize("concentration, reason", [
+    (100.0, "Unusually high for this site"),
+    (1.0, "Unusually low for this site")
+])
+def test_jump_is_flagged(detector, concentration, reason):
+    scores = detector.score(batch(concentration))
+    assert scores["anomaly_reason"].tolist() == [reason]
+    assert abs(scores["robust_z"].iloc[0]) > detector.threshold
+
+
+def test_typical_reading_is_not_flagged(detector):
+    scores = detector.score(batch(10.3))
+    assert scores["anomaly"].tolist() == [False]
+    assert scores["anomaly_reason"].tolist() == [None]
+
+
+def test_too_little_history_is_not_scored():
+    detector = RobustAnomalyDetector(min_history=5)
+    detector.update(batch(10.0, 10.0, 10.0, 10.0))
+    scores = detector.score(batch(1000.0))
+    assert scores["anomaly"].tolist() == [False]
+    assert scores["robust_z"].isna().all()
+
+
+def test_history_is_kept_per_site(detector):
+    scores = detector.score(batch(100.0, site="Plant B"))
+    assert scores["anomaly"].tolist() == [False]
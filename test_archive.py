@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+
+import pyarrow.dataset as ds
+import pytest
+
+from archive import ResultsArchive
+from thresholds import ANALYTES, build_result, thresholds_for_ph
+
+ANALYZED_AT = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = ResultsArchive(str(tmp_path / "archive"), row_group_size=8, compact_after=1000)
+    levels = thresholds_for_ph(7.0)
+    analytes = [analyte for analyte in ANALYTES if analyte in levels][:8]
+    for i in range(8):
+        results = [build_result(analyte, 0.001 * (i + 1), levels[analyte]) for analyte in analytes]
+        archive.append(results, "Plant A", 7.0, analyzed_at=ANALYZED_AT, sample_id=f"s{i}")
+    archive.compact()
+    return archive, analytes
+
+
+def test_compact_leaves_one_file_per_partition(archive):
+    archive, analytes = archive
+    fragments = list(archive.dataset().get_fragments())
+    assert len(fragments) == 1
+    assert fragments[0].metadata.num_rows == 8 * len(analytes)
+
+
+def test_analyte_filter_prunes_row_groups(archive):
+    archive, analytes = archive
+    fragment, = archive.dataset().get_fragments()
+    total = fragment.metadata.num_row_groups
+    kept = fragment.split_by_row_group(ds.field("analyte") == analytes[0])
+    assert total == len(analytes)
+    assert len(kept) == 1
+
+
+def test_query_returns_categoricals(archive):
+    archive, analytes = archive
+    df = archive.query(analytes=[analytes[1]])
+    assert len(df) == 8
+    assert set(df["analyte"]) == {analytes[1]}
+    assert df["analyte"].dtype == "category"
+    assert df["status"].cat.ordered
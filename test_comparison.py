@@ -0,0 +1,40 @@
+import io
+
+import pytest
+
+from comparison import build_matrix, read_samples_csv, score_samples
+from thresholds import build_result, thresholds_for_ph
+from units import normalize_units
+
+CSV = """sample,analyte,concentration,ph,unit
+S1,Lead (Pb2+),0.005,11,
+S1,Manganese (Mn2+),0.02,11,mg/L
+S2,Lead (Pb2+),5,11,ug/L
+S2,Chloride (Cl-),5,7,
+"""
+
+
+@pytest.fixture
+def scored():
+    samples, unknown_units = normalize_units(read_samples_csv(io.StringIO(CSV)))
+    assert unknown_units == []
+    scored, unknown = score_samples(samples)
+    assert unknown == []
+    return scored
+
+
+def test_reading_at_threshold_scores_like_single_sample(scored):
+    for row in scored.itertuples(index=False):
+        data = thresholds_for_ph(row.ph)[row.analyte]
+        result = build_result(row.analyte, row.concentration, data)
+        assert row.status == result["status"], row
+        assert row.times_threshold == pytest.approx(result["times_threshold"])
+
+
+def test_lead_at_alkaline_action_level(scored):
+    lead = scored[scored["analyte"] == "Lead (Pb2+)"]
+    assert lead["status"].tolist() == ["action", "action"]
+
+
+def test_matrix_values_are_float32(scored):
+    assert build_matrix(scored, "concentration")["Lead (Pb2+)"].dtype == "float32"
@@ -0,0 +1,33 @@
+import io
+import zipfile
+
+import pytest
+
+from report import zip_reports
+
+
+def names(reports, fmt="pdf"):
+    return zipfile.ZipFile(io.BytesIO(zip_reports(reports, fmt))).namelist()
+
+
+@pytest.mark.parametrize("site, expected", [
+    ("Plant A", "Plant A.pdf"),
+    ("Plant A/1", "Plant A_1.pdf"),
+    ("../../etc/passwd", "_.._etc_passwd.pdf"),
+    ("C:\\sites\\north", "C__sites_north.pdf"),
+    ("...", "site.pdf"),
+    ("", "site.pdf")
+])
+def test_site_names_become_plain_file_names(site, expected):
+    assert names({site: b"report"}) == [expected]
+
+
+def test_colliding_names_are_numbered():
+    assert names({"Plant A/1": b"1", "Plant A:1": b"2", "plant a_1": b"3"}) == [
+        "Plant A_1.pdf", "Plant A_1 (2).pdf", "plant a_1 (3).pdf"
+    ]
+
+
+def test_reports_are_stored_unchanged():
+    archive = zipfile.ZipFile(io.BytesIO(zip_reports({"Plant A": b"%PDF-1.4"}, "pdf")))
+    assert archive.read("Plant A.pdf") == b"%PDF-1.4"
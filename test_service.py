@@ -0,0 +1,86 @@
+import asyncio
+
+import orjson
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from alerts import AlertEngine
+from service import (
+    INCOMPLETE, NDJSON, SCALAR_THRESHOLD, STREAM_CHUNK, InvalidSample, create_app, score_samples
+)
+
+
+def sample(concentration, **fields):
+    return {"readings": [{"analyte": "Chloride (Cl-)", "concentration": concentration}], **fields}
+
+
+def large_batch(count):
+    # Enough readings to take the vectorized path
+    return [sample(1.0) for _ in range(count)]
+
+
+@pytest.mark.parametrize("concentration", ["nan", float("inf"), -1.0])
+@pytest.mark.parametrize("count", [1, SCALAR_THRESHOLD + 1])
+def test_invalid_concentration_names_the_sample(concentration, count):
+    samples = large_batch(count)
+    samples[-1] = sample(concentration)
+    with pytest.raises(InvalidSample, match="concentration") as error:
+        score_samples(samples)
+    assert error.value.index == count - 1
+
+
+def test_zero_concentration_is_scored():
+    assert score_samples([sample(0.0)])[0]["overall_status"] == "safe"
+
+
+@pytest.mark.parametrize("count", [1, SCALAR_THRESHOLD + 1])
+def test_sample_without_readings_is_incomplete(count):
+    samples = large_batch(count)
+    samples[-1] = {"id": "empty", "readings": []}
+    scored = score_samples(samples)
+    assert scored[-1]["overall_status"] == INCOMPLETE
+    assert scored[-1]["results"] == []
+    assert {s["overall_status"] for s in scored[:-1]} <= {"safe"}
+
+
+def post(path, body, content_type="application/json"):
+    async def run():
+        app = create_app(alert_engine=AlertEngine(sinks=[], background=False))
+        async with TestClient(TestServer(app)) as client:
+            response = await client.post(path, data=body, headers={"Content-Type": content_type})
+            return response.status, await response.read()
+    return asyncio.run(run())
+
+
+def test_score_rejects_negative_concentration():
+    status, body = post("/score", orjson.dumps(sample(-0.5)))
+    assert status == 400
+    assert "concentration" in orjson.loads(body)["error"]
+
+
+def test_batch_error_reports_the_failing_sample():
+    bad = STREAM_CHUNK + 200
+    samples = [sample(1.0) for _ in range(STREAM_CHUNK * 2)]
+    samples[bad] = sample("nan")
+    body = b"".join(orjson.dumps(s, option=orjson.OPT_APPEND_NEWLINE) for s in samples)
+    status, response = post("/score/batch", body, NDJSON)
+    assert status == 200
+    lines = [orjson.loads(line) for line in response.splitlines()]
+    assert len(lines) == STREAM_CHUNK + 1
+    assert lines[-1]["error"].startswith(f"Invalid batch at sample {bad}:")
+
+
+def test_batch_error_in_first_slice_is_a_400():
+    samples = [sample(1.0), sample(1.0), sample(-3)]
+    status, body = post("/score/batch", orjson.dumps({"samples": samples}))
+    assert status == 400
+    assert orjson.loads(body)["error"].startswith("Invalid batch at sample 2:")
+
+
+def test_zero_reading_is_flagged_as_an_anomaly():
+    status, body = post("/score", orjson.dumps(sample(0.0, site="Plant A")))
+    assert status == 200
+    result, = orjson.loads(body)["results"]
+    assert result["status"] == "safe"
+    assert result["anomaly"] is True
+    assert result["anomaly_reason"] == "Non-positive concentration"
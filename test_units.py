@@ -0,0 +1,54 @@
+import math
+
+import pandas as pd
+import pytest
+
+from units import normalize_units, parse_unit, unit_factor
+
+NITRATE = "Nitrate (NO3- as N)"
+
+
+@pytest.mark.parametrize("analyte, unit, expected", [
+    (NITRATE, "mmol/L", 14.007),
+    (NITRATE, "mmol/L as N", 14.007),
+    (NITRATE, "mg/L as NO3", 14.007 / 62.004),
+    ("Calcium (Ca2+)", "mg/L as CaCO3", 40.078 / 100.087),
+    ("Mercury (Hg2+)", "µg/L", 0.001),
+    ("Mercury (Hg2+)", "ppb", 0.001),
+    ("Chloride (Cl-)", None, 1.0)
+])
+def test_unit_factor(analyte, unit, expected):
+    assert unit_factor(analyte, unit) == pytest.approx(expected)
+
+
+def test_calcium_as_caco3():
+    # 100 mg/L as CaCO3 is 1 mmol/L, i.e. 40.078 * 100 / 100.087 mg/L of Ca
+    assert 100 * unit_factor("Calcium (Ca2+)", "mg/L as CaCO3") == pytest.approx(40.04, abs=0.01)
+
+
+@pytest.mark.parametrize("analyte, unit", [
+    ("Chloride (Cl-)", "mg/L as CaCO3"),
+    ("Chloride (Cl-)", "mmol/L as N"),
+    ("Chloride (Cl-)", "furlongs"),
+    ("Unknown analyte", "mmol/L")
+])
+def test_unconvertible_units_are_flagged(analyte, unit):
+    assert math.isnan(unit_factor(analyte, unit))
+
+
+def test_parse_unit_spellings():
+    assert parse_unit(" UG/l ") == "ug/L"
+    assert parse_unit("mg/l as caco3") == "mg/L as CaCO3"
+    assert parse_unit("mg/L as X") is None
+
+
+def test_normalize_units():
+    readings = pd.DataFrame({
+        "analyte": ["Lead (Pb2+)", NITRATE, "Chloride (Cl-)", "Chloride (Cl-)"],
+        "concentration": [12.0, 1.0, 3.0, 3.0],
+        "unit": ["ug/L", "mmol/L", None, "mg/L as CaCO3"]
+    })
+    normalized, unknown = normalize_units(readings)
+    assert "unit" not in normalized
+    assert normalized["concentration"].tolist() == pytest.approx([0.012, 14.007, 3.0])
+    assert unknown == ["Chloride (Cl-): mg/L as CaCO3"]
@@ -0,0 +1,24 @@
+"""HydroStar brand and status colors."""
+
+# HydroStar Brand Colors
+PRIMARY_GREEN = "#a7d730"
+SECONDARY_GREEN = "#499823"
+DARK_GREY = "#30343c"
+LIGHT_GREY = "#8c919a"
+PLOT_BG = "#f2f4f7"
+TEXT_BLACK = "#000000"
+
+# Status colors
+STATUS_GREEN = "#4CAF50"
+STATUS_ORANGE = "#FF9800"
+STATUS_RED = "#F44336"
+
+
+def get_status_color(status):
+    """Return color based on status."""
+    if status == "escalation":
+        return STATUS_RED
+    elif status == "action":
+        return STATUS_ORANGE
+    else:
+        return STATUS_GREEN
@@ -0,0 +1,446 @@
+"""Threshold tables and the pH-continuous threshold model.
+
+The action and escalation levels come from two tables, one for neutral and
+one for alkaline wastewater. A sample's measured pH selects between them:
+the neutral table applies up to ``NEUTRAL_PH_MAX``, the alkaline table from
+``ALKALINE_PH_MIN``, and in between the levels are interpolated on a log
+scale so thresholds move smoothly with pH instead of jumping at a switch.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+# Hardcoded data from Electrolyser_Wastewater_Action_Levels.xlsx
+ALKALINE_DATA = {
+    "Chloride (Cl-)": {
+        "action_level": 10.0,
+        "escalation_level": 50.0,
+        "why_it_matters": "Anodic Cl2/ClO-/ClO3- formation competes with OER.",
+        "citation": "CER well-documented; more competitive under alkaline on MMO anodes (Ru/Ir oxides). (Chen et al., 2021, Electrochim. Acta)"
+    },
+    "Sulphide (S2-/HS-)": {
+        "action_level": 0.05,
+        "escalation_level": 0.5,
+        "why_it_matters": "Oxidizes to S0/polysulfides; electrode poisoning.",
+        "citation": "Rapid anodic oxidation and catalyst fouling. (Mollah et al., 2004, J. Hazard. Mater.)"
+    },
+    "Cyanide (CN-)": {
+        "action_level": 0.01,
+        "escalation_level": 0.05,
+        "why_it_matters": "Oxidized; with Cl- forms CNCl (toxic).",
+        "citation": "CN oxidation and CNCl formation in Cl- media reported. (Zhou et al., 2012, Electrochim. Acta)"
+    },
+    "Nitrate (NO3- as N)": {
+        "action_level": 5.0,
+        "escalation_level": 20.0,
+        "why_it_matters": "Competes with HER at cathode - NOx/NH3.",
+        "citation": "Nitrate readily reduced; competes with HER. (Rosca et al., 2009, Chem. Rev.)"
+    },
+    "Nitrite (NO2- as N)": {
+        "action_level": 0.1,
+        "escalation_level": 1.0,
+        "why_it_matters": "Cathodic reduction to NO/N2O/NH3.",
+        "citation": "Nitrite reduced at low conc; side-reactions documented. (Dima et al., 2003, J. Electroanal. Chem.)"
+    },
+    "Ammonium (NH4+)": {
+        "action_level": 1.0,
+        "escalation_level": 5.0,
+        "why_it_matters": "Forms chloramines with Cl-; NH3 slip.",
+        "citation": "Chloramine kinetics well studied. (Vikesland et al., 2001, ES&T)"
+    },
+    "Carbonate/Bicarbonate": {
+        "action_level": 100.0,
+        "escalation_level": 200.0,
+        "why_it_matters": "Consumes OH-; carbonate scaling.",
+        "citation": "CO2 absorption - carbonate formation in alkaline electrolytes. (Li et al., 2020, Nat. Catal.)"
+    },
+    "Phosphate (PO43-)": {
+        "action_level": 2.0,
+        "escalation_level": 5.0,
+        "why_it_matters": "Precipitates with Ca2+/Mg2+.",
+        "citation": "Electrochemically induced Ca-phosphate precipitation. (Snoeyink & Jenkins, 1980, Water Chemistry)"
+    },
+    "Iron (Fe2+/Fe3+)": {
+        "action_level": 0.1,
+        "escalation_level": 0.3,
+        "why_it_matters": "Hydroxide sludge; surface blocking.",
+        "citation": "Fe hydroxide precipitation and deposition on electrodes. (Zhang et al., 2016, J. Power Sources)"
+    },
+    "Manganese (Mn2+)": {
+        "action_level": 0.02,
+        "escalation_level": 0.05,
+        "why_it_matters": "Anodic MnO2 films (insulating).",
+        "citation": "Mn2+ oxidation - MnO2 deposits. (Post, 1999, Water Res.)"
+    },
+    "Copper (Cu2+)": {
+        "action_level": 0.05,
+        "escalation_level": 0.2,
+        "why_it_matters": "Cathodic plating; HER overpotential shifts.",
+        "citation": "Cu deposition on cathodes. (Fan et al., 2013, Electrochim. Acta)"
+    },
+    "Nickel (Ni2+)": {
+        "action_level": 0.05,
+        "escalation_level": 0.1,
+        "why_it_matters": "Precipitation/deposition; catalyst drift.",
+        "citation": "Ni hydroxide deposition documented. (Biesinger et al., 2009, Appl. Surf. Sci.)"
+    },
+    "Lead (Pb2+)": {
+        "action_level": 0.005,
+        "escalation_level": 0.01,
+        "why_it_matters": "Cathodic deposition; toxicity.",
+        "citation": "Pb deposition/interference. (Hu et al., 2003, Water Res.)"
+    },
+    "Cadmium (Cd2+)": {
+        "action_level": 0.001,
+        "escalation_level": 0.005,
+        "why_it_matters": "Deposition; toxicity.",
+        "citation": "Cd2+ electroreduction documented. (Chen et al., 2000, J. Appl. Electrochem.)"
+    },
+    "Mercury (Hg2+)": {
+        "action_level": 0.0005,
+        "escalation_level": 0.001,
+        "why_it_matters": "Amalgams; extreme toxicity.",
+        "citation": "Hg deposition and amalgam formation. (Liu et al., 2002, ES&T)"
+    }
+}
+
+NEUTRAL_DATA = {
+    "Chloride (Cl-)": {
+        "action_level": 5.0,
+        "escalation_level": 20.0,
+        "why_it_matters": "Cl2/HOCl formation competes strongly with OER at neutral pH.",
+        "citation": "Cl- oxidation more competitive at neutral; CER vs OER selectivity. (Zhong et al., 2020, Chem. Rev.)"
+    },
+    "Bromide (Br-)": {
+        "action_level": 0.1,
+        "escalation_level": 0.5,
+        "why_it_matters": "HOBr/BrO3- formation.",
+        "citation": "Bromide oxidized to bromate at neutral. (von Gunten, 2003, Water Res.)"
+    },
+    "Iodide (I-)": {
+        "action_level": 0.02,
+        "escalation_level": 0.1,
+        "why_it_matters": "I2/iodate; catalyst poisoning.",
+        "citation": "Iodide oxidation documented at neutral/alkaline. (Heeb et al., 2014, ES&T)"
+    },
+    "Sulphide (HS-/S2-)": {
+        "action_level": 0.02,
+        "escalation_level": 0.2,
+        "why_it_matters": "Rapid anodic oxidation; fouling.",
+        "citation": "HS- oxidation to S0; poisoning electrodes. (Jiang et al., 2017, J. Hazard. Mater.)"
+    },
+    "Cyanide (CN-)": {
+        "action_level": 0.005,
+        "escalation_level": 0.02,
+        "why_it_matters": "Oxidized; CNCl with Cl-.",
+        "citation": "Electrochemical CN oxidation. (Rodriguez et al., 2002, Ind. Eng. Chem. Res.)"
+    },
+    "Nitrate (NO3- as N)": {
+        "action_level": 2.0,
+        "escalation_level": 10.0,
+        "why_it_matters": "Competes with HER; reduced to NH3/NO/N2O.",
+        "citation": "Nitrate reduction well studied. (Rosca et al., 2009, Chem. Rev.)"
+    },
+    "Nitrite (NO2- as N)": {
+        "action_level": 0.1,
+        "escalation_level": 1.0,
+        "why_it_matters": "Cathodic reduction products NO/N2O/NH3.",
+        "citation": "Nitrite reduction pathways documented. (Dima et al., 2003, J. Electroanal. Chem.)"
+    },
+    "Ammonium (NH4+)": {
+        "action_level": 0.5,
+        "escalation_level": 2.0,
+        "why_it_matters": "Forms chloramines with HOCl from Cl-.",
+        "citation": "Chloramine formation kinetics at neutral pH. (Vikesland et al., 2001, ES&T)"
+    },
+    "Phosphate (PO43-)": {
+        "action_level": 3.0,
+        "escalation_level": 8.0,
+        "why_it_matters": "Ca/Mg phosphate scaling.",
+        "citation": "Electrochemically induced phosphate precipitation. (Snoeyink & Jenkins, 1980)"
+    },
+    "Carbonate/Bicarbonate": {
+        "action_level": 150.0,
+        "escalation_level": 300.0,
+        "why_it_matters": "Buffering; CaCO3 scaling possible.",
+        "citation": "CO2/HCO3- impacts scaling, OER efficiency. (Li et al., 2020, Nat. Catal.)"
+    },
+    "Calcium (Ca2+)": {
+        "action_level": 40.0,
+        "escalation_level": 100.0,
+        "why_it_matters": "CaCO3/CaSO4 scale.",
+        "citation": "Scaling tendency known. (Stumm & Morgan, 1996, Aquatic Chemistry)"
+    },
+    "Magnesium (Mg2+)": {
+        "action_level": 20.0,
+        "escalation_level": 60.0,
+        "why_it_matters": "MgCO3/Mg-phosphate scaling.",
+        "citation": "Scaling risk with phosphate. (Stumm & Morgan, 1996)"
+    },
+    "Barium (Ba2+)": {
+        "action_level": 0.03,
+        "escalation_level": 0.1,
+        "why_it_matters": "BaSO4 insoluble scale.",
+        "citation": "BaSO4 precipitation well documented. (Snoeyink & Jenkins, 1980)"
+    },
+    "Strontium (Sr2+)": {
+        "action_level": 0.1,
+        "escalation_level": 0.3,
+        "why_it_matters": "SrSO4/SrCO3 scaling.",
+        "citation": "Sr salts scale similarly to Ba. (Stumm & Morgan, 1996)"
+    },
+    "Iron (Fe2+/Fe3+)": {
+        "action_level": 0.05,
+        "escalation_level": 0.2,
+        "why_it_matters": "Soluble at neutral - electrode fouling.",
+        "citation": "Fe redox cycling and fouling documented. (Zhang et al., 2016)"
+    },
+    "Manganese (Mn2+)": {
+        "action_level": 0.02,
+        "escalation_level": 0.05,
+        "why_it_matters": "Oxidized to MnO2 (insulating).",
+        "citation": "Mn2+ - MnO2 passivation. (Post, 1999, Water Res.)"
+    },
+    "Copper (Cu2+)": {
+        "action_level": 0.02,
+        "escalation_level": 0.1,
+        "why_it_matters": "Cathodic plating.",
+        "citation": "Cu deposition observed. (Fan et al., 2013, Electrochim. Acta)"
+    },
+    "Nickel (Ni2+)": {
+        "action_level": 0.03,
+        "escalation_level": 0.1,
+        "why_it_matters": "Deposition/poisoning.",
+        "citation": "Ni hydroxide deposition. (Biesinger et al., 2009)"
+    },
+    "Lead (Pb2+)": {
+        "action_level": 0.003,
+        "escalation_level": 0.01,
+        "why_it_matters": "Cathodic deposition.",
+        "citation": "Pb deposition. (Hu et al., 2003, Water Res.)"
+    },
+    "Cadmium (Cd2+)": {
+        "action_level": 0.001,
+        "escalation_level": 0.005,
+        "why_it_matters": "Deposition.",
+        "citation": "Cd2+ electroreduction documented. (Chen et al., 2000)"
+    },
+    "Mercury (Hg2+)": {
+        "action_level": 0.0005,
+        "escalation_level": 0.001,
+        "why_it_matters": "Amalgams.",
+        "citation": "Hg deposition/amalgam. (Liu et al., 2002, ES&T)"
+    }
+}
+
+
+# Regime band edges in pH units
+NEUTRAL_PH_MAX = 8.0
+ALKALINE_PH_MIN = 10.0
+DEFAULT_PH = 7.0
+
+STATUS_ORDER = ["safe", "action", "escalation"]
+
+# The two tables name some analytes differently; neutral names are canonical
+ANALYTE_ALIASES = {
+    "Sulphide (S2-/HS-)": "Sulphide (HS-/S2-)"
+}
+
+
+def canonical_analyte(analyte):
+    """Return the canonical name for an analyte."""
+    return ANALYTE_ALIASES.get(analyte, analyte)
+
+
+def _canonical_table(data):
+    return {canonical_analyte(analyte): entry for analyte, entry in data.items()}
+
+
+_NEUTRAL = _canonical_table(NEUTRAL_DATA)
+_ALKALINE = _canonical_table(ALKALINE_DATA)
+
+ANALYTES = list(_NEUTRAL) + [a for a in _ALKALINE if a not in _NEUTRAL]
+_ANALYTE_CODES = {analyte: i for i, analyte in enumerate(ANALYTES)}
+
+
+@lru_cache(maxsize=None)
+def _categorical_dtypes():
+    import pandas as pd
+
+    return {
+        "STATUS_DTYPE": pd.CategoricalDtype(STATUS_ORDER, ordered=True),
+        "ANALYTE_DTYPE": pd.CategoricalDtype(ANALYTES)
+    }
+
+
+def __getattr__(name):
+    # pandas is only needed for the vectorized paths, so STATUS_DTYPE and
+    # ANALYTE_DTYPE are built on first access to keep it off the app's
+    # startup path
+    if name in ("STATUS_DTYPE", "ANALYTE_DTYPE"):
+        return _categorical_dtypes()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _level_array(table):
+    """Return an (analytes, 2) array of action/escalation levels, NaN where undefined."""
+    levels = np.full((len(ANALYTES), 2), np.nan)
+    for i, analyte in enumerate(ANALYTES):
+        if analyte in table:
+            levels[i] = table[analyte]["action_level"], table[analyte]["escalation_level"]
+    return levels
+
+
+_NEUTRAL_LEVELS = _level_array(_NEUTRAL)
+_ALKALINE_LEVELS = _level_array(_ALKALINE)
+
+
+def get_status(concentration, action_level, escalation_level):
+    """Determine the status based on concentration levels."""
+    if concentration >= escalation_level:
+        return "escalation"
+    elif concentration >= action_level:
+        return "action"
+    else:
+        return "safe"
+
+
+def get_status_message(status, analyte, concentration, data):
+    """Generate status message based on the concentration level."""
+    if status == "safe":
+        return f"Concentration is within safe limits (below {data['action_level']} mg/L action level)."
+    elif status == "action":
+        return f"ACTION LEVEL REACHED: This could start happening - {data['why_it_matters']} Reference: {data['citation']}"
+    else:
+        return f"ESCALATION LEVEL REACHED: This is serious and green hydrogen production should be stopped. {data['why_it_matters']} Reference: {data['citation']}"
+
+
+def build_result(analyte, concentration, data):
+    """Score one reading against its threshold entry and return a results dict."""
+    status = get_status(concentration, data["action_level"], data["escalation_level"])
+    
+    # Calculate times above thresholds
+    times_threshold = concentration / data["action_level"]
+    times_escalation = concentration / data["escalation_level"]
+    
+    return {
+        "analyte": analyte,
+        "concentration": concentration,
+        "action_level": data["action_level"],
+        "escalation_level": data["escalation_level"],
+        "status": status,
+        "status_label": status.capitalize(),
+        "times_threshold": times_threshold,
+        "times_escalation": times_escalation,
+        "why_it_matters": data["why_it_matters"],
+        "citation": data["citation"],
+        "message": get_status_message(status, analyte, concentration, data)
+    }
+
+
+def classify(concentration, action_level, escalation_level):
+    """Vectorized ``get_status``: return status codes indexing ``STATUS_ORDER``."""
+    return np.select(
+        [concentration >= escalation_level, concentration >= action_level],
+        [2, 1],
+        default=0
+    ).astype(np.int8)
+
+
+def alkaline_weight(ph):
+    """Return the weight of the alkaline table at ``ph``, from 0 (neutral) to 1 (alkaline)."""
+    return np.clip((np.asarray(ph, dtype=float) - NEUTRAL_PH_MAX) / (ALKALINE_PH_MIN - NEUTRAL_PH_MAX), 0.0, 1.0)
+
+
+def regime(ph):
+    """Return the threshold regime name for a single pH value."""
+    weight = alkaline_weight(ph)
+    if weight <= 0:
+        return "neutral"
+    if weight >= 1:
+        return "alkaline"
+    return "transition"
+
+
+def interpolate_levels(codes, ph):
+    """Return action and escalation levels for analyte ``codes`` at ``ph``.
+
+    ``codes`` index ``ANALYTES`` and ``ph`` is a scalar or an array of the
+    same length. Inside the transition band levels are interpolated
+    geometrically; an analyte defined in only one table keeps that table's
+    levels there. Levels are NaN where an analyte is not defined at that pH.
+    """
+    codes = np.asarray(codes)
+    weight = np.broadcast_to(alkaline_weight(ph), codes.shape)[:, None]
+    neutral = _NEUTRAL_LEVELS[codes]
+    alkaline = _ALKALINE_LEVELS[codes]
+
+    with np.errstate(invalid="ignore"):
+        blended = np.exp((1 - weight) * np.log(neutral) + weight * np.log(alkaline))
+    blended = np.where(np.isnan(neutral), alkaline, np.where(np.isnan(alkaline), neutral, blended))
+    levels = np.where(weight <= 0, neutral, np.where(weight >= 1, alkaline, blended))
+    return levels[:, 0], levels[:, 1]
+
+
+@lru_cache(maxsize=256)
+def thresholds_for_ph(ph):
+    """Return a threshold table, shaped like ``NEUTRAL_DATA``, for a measured pH."""
+    action, escalation = interpolate_levels(np.arange(len(ANALYTES)), ph)
+    prefer_alkaline = alkaline_weight(ph) >= 0.5
+
+    data = {}
+    for analyte, action_level, escalation_level in zip(ANALYTES, action, escalation):
+        if np.isnan(action_level):
+            continue
+        tables = (_ALKALINE, _NEUTRAL) if prefer_alkaline else (_NEUTRAL, _ALKALINE)
+        source = next(t[analyte] for t in tables if analyte in t)
+        data[analyte] = {
+            "action_level": float(action_level),
+            "escalation_level": float(escalation_level),
+            "why_it_matters": source["why_it_matters"],
+            "citation": source["citation"]
+        }
+    return data
+
+
+def classify_frame(readings, default_ph=DEFAULT_PH):
+    """Classify a long frame of readings in one vectorized pass.
+
+    ``readings`` has ``analyte`` and ``concentration`` columns and optionally
+    a per-row ``ph`` column (missing values fall back to ``default_ph``), so
+    batches mixing pH regimes are scored together. Returns a frame aligned
+    to ``readings`` with the canonical ``analyte`` categorical, ``ph``,
+    ``action_level``, ``escalation_level`` and ordered ``status``. Rows whose
+    analyte is not defined at their pH have NaN levels and a missing status.
+    """
+    import pandas as pd
+
+    # Resolve names once per distinct analyte rather than once per row
+    raw = pd.Categorical(readings["analyte"])
+    lookup = np.array(
+        [_ANALYTE_CODES.get(canonical_analyte(str(name)), -1) for name in raw.categories] + [-1],
+        dtype=np.int16
+    )
+    analyte = pd.Series(pd.Categorical.from_codes(lookup[raw.codes], dtype=_categorical_dtypes()["ANALYTE_DTYPE"]), index=readings.index)
+    if "ph" in readings:
+        ph = readings["ph"].astype(float).fillna(default_ph).to_numpy()
+    else:
+        ph = np.full(len(readings), float(default_ph))
+
+    codes = analyte.cat.codes.to_numpy()
+    known = codes >= 0
+    action = np.full(len(readings), np.nan)
+    escalation = np.full(len(readings), np.nan)
+    action[known], escalation[known] = interpolate_levels(codes[known], ph[known])
+
+    concentration = readings["concentration"].to_numpy(dtype=np.float64)
+    status_codes = classify(concentration, action, escalation)
+    status_codes[np.isnan(action)] = -1
+
+    return pd.DataFrame({
+        "analyte": analyte,
+        "ph": ph,
+        "action_level": action,
+        "escalation_level": escalation,
+        "status": pd.Categorical.from_codes(status_codes, dtype=_categorical_dtypes()["STATUS_DTYPE"])
+    }, index=readings.index)
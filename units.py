@@ -0,0 +1,165 @@
+"""Unit normalization for lab concentrations.
+
+Thresholds are in mg/L, in the basis each analyte is named in (nitrate and
+nitrite as N, carbonate as CO3). Lab exports mix mass units (µg/L for the
+heavy metals), molar units (mmol/L) and alternative bases ("mg/L as CaCO3",
+"mg/L as NO3"), so readings pass through ``normalize_units`` before they
+are classified. A unit is a mass or molar unit, optionally followed by
+``as <basis>``; spelling is lenient (``ug/l``, ``µg/L`` and ``ppb`` are the
+same unit). One mole of a basis stands for one mole of the analyte, so
+``mmol/L as N`` for nitrate is simply mmol/L of nitrate.
+"""
+import numpy as np
+
+from thresholds import ANALYTES, canonical_analyte
+
+DEFAULT_UNIT = "mg/L"
+
+# Factors from each mass unit to mg/L
+MASS_UNITS = {"mg/L": 1.0, "ug/L": 1e-3, "ng/L": 1e-6, "g/L": 1e3}
+
+# Factors from each molar unit to mmol/L, multiplied by the molar mass
+MOLAR_UNITS = {"mmol/L": 1.0, "umol/L": 1e-3, "mol/L": 1e3}
+
+# Molar mass (g/mol) of the basis each threshold is expressed in, so one
+# mmol/L of nitrate is 14.007 mg/L as N
+MOLAR_MASSES = {
+    "Chloride (Cl-)": 35.45,
+    "Bromide (Br-)": 79.904,
+    "Iodide (I-)": 126.904,
+    "Sulphide (HS-/S2-)": 32.06,
+    "Cyanide (CN-)": 26.017,
+    "Nitrate (NO3- as N)": 14.007,
+    "Nitrite (NO2- as N)": 14.007,
+    "Ammonium (NH4+)": 18.038,
+    "Phosphate (PO43-)": 94.971,
+    "Carbonate/Bicarbonate": 60.008,
+    "Calcium (Ca2+)": 40.078,
+    "Magnesium (Mg2+)": 24.305,
+    "Barium (Ba2+)": 137.327,
+    "Strontium (Sr2+)": 87.62,
+    "Iron (Fe2+/Fe3+)": 55.845,
+    "Manganese (Mn2+)": 54.938,
+    "Copper (Cu2+)": 63.546,
+    "Nickel (Ni2+)": 58.693,
+    "Lead (Pb2+)": 207.2,
+    "Cadmium (Cd2+)": 112.414,
+    "Mercury (Hg2+)": 200.59
+}
+
+# Molar masses of the alternative bases labs report in
+BASIS_MASSES = {"CaCO3": 100.087, "N": 14.007, "NO3": 62.004, "NO2": 46.005, "P": 30.974, "PO4": 94.971}
+
+# Bases accepted per analyte; one mole of the basis carries one mole of the
+# analyte's own basis (CaCO3 hardness and alkalinity are per Ca/Mg/CO3)
+ANALYTE_BASES = {
+    "Nitrate (NO3- as N)": ("N", "NO3"),
+    "Nitrite (NO2- as N)": ("N", "NO2"),
+    "Ammonium (NH4+)": ("N",),
+    "Phosphate (PO43-)": ("P", "PO4"),
+    "Carbonate/Bicarbonate": ("CaCO3",),
+    "Calcium (Ca2+)": ("CaCO3",),
+    "Magnesium (Mg2+)": ("CaCO3",)
+}
+
+_UNIT_SPELLINGS = {
+    "mg/l": "mg/L", "ppm": "mg/L",
+    "ug/l": "ug/L", "mcg/l": "ug/L", "ppb": "ug/L",
+    "ng/l": "ng/L", "ppt": "ng/L",
+    "g/l": "g/L",
+    "mmol/l": "mmol/L", "mm": "mmol/L",
+    "umol/l": "umol/L", "um": "umol/L",
+    "mol/l": "mol/L", "m": "mol/L"
+}
+_BASIS_SPELLINGS = {basis.lower(): basis for basis in BASIS_MASSES}
+
+
+def parse_unit(unit):
+    """Return the canonical spelling of ``unit``, or None when it is not recognized."""
+    text = " ".join(str(unit).replace("µ", "u").replace("μ", "u").split()).lower()
+    base, _, basis = text.partition(" as ")
+    base = _UNIT_SPELLINGS.get(base)
+    if base is None:
+        return None
+    if not basis:
+        return base
+    basis = _BASIS_SPELLINGS.get(basis.rstrip("-"))
+    return f"{base} as {basis}" if basis else None
+
+
+def _factor(analyte, unit):
+    """Return the factor from ``unit`` (canonical) to mg/L for ``analyte``, NaN if undefined."""
+    base, _, basis = unit.partition(" as ")
+    if basis and basis not in ANALYTE_BASES.get(analyte, ()):
+        return np.nan
+    if base in MOLAR_UNITS:
+        return MOLAR_UNITS[base] * MOLAR_MASSES.get(analyte, np.nan)
+    if not basis:
+        return MASS_UNITS[base]
+    return MASS_UNITS[base] * MOLAR_MASSES[analyte] / BASIS_MASSES[basis]
+
+
+UNITS = list(MASS_UNITS) + list(MOLAR_UNITS) + [
+    f"{base} as {basis}" for base in [*MASS_UNITS, *MOLAR_UNITS] for basis in BASIS_MASSES
+]
+_UNIT_CODES = {unit: i for i, unit in enumerate(UNITS)}
+_ANALYTE_CODES = {analyte: i for i, analyte in enumerate(ANALYTES)}
+
+# (analytes + 1, units + 1) factors; the last row is for analytes without
+# thresholds (mass units only) and the last column for unrecognized units
+_FACTORS = np.full((len(ANALYTES) + 1, len(UNITS) + 1), np.nan)
+for _i, _analyte in enumerate(ANALYTES + [None]):
+    for _j, _unit in enumerate(UNITS):
+        _FACTORS[_i, _j] = _factor(_analyte, _unit)
+
+
+def unit_factor(analyte, unit=None):
+    """Return the factor converting ``analyte`` from ``unit`` to mg/L, NaN if it cannot be converted."""
+    unit_code = _UNIT_CODES[DEFAULT_UNIT] if unit is None else _UNIT_CODES.get(parse_unit(unit), -1)
+    return float(_FACTORS[_ANALYTE_CODES.get(canonical_analyte(analyte), -1), unit_code])
+
+
+def unit_factors(analytes, units, default_unit=DEFAULT_UNIT):
+    """Vectorized ``unit_factor`` over paired analyte and unit sequences.
+
+    Names and units are resolved once per distinct value; missing units
+    count as ``default_unit``. Returns a float array, NaN where a unit is
+    unrecognized or cannot be converted for its analyte.
+    """
+    import pandas as pd
+
+    raw_analytes = pd.Categorical(analytes)
+    analyte_lookup = np.array(
+        [_ANALYTE_CODES.get(canonical_analyte(str(name)), -1) for name in raw_analytes.categories] + [-1],
+        dtype=np.intp
+    )
+    raw_units = pd.Categorical(units)
+    unit_lookup = np.array(
+        [_UNIT_CODES.get(parse_unit(unit), -1) for unit in raw_units.categories] + [_UNIT_CODES[parse_unit(default_unit)]],
+        dtype=np.intp
+    )
+    return _FACTORS[analyte_lookup[raw_analytes.codes], unit_lookup[raw_units.codes]]
+
+
+def normalize_units(readings, default_unit=DEFAULT_UNIT):
+    """Convert a long frame of readings to mg/L in one vectorized pass.
+
+    ``readings`` has ``analyte`` and ``concentration`` columns and an
+    optional ``unit`` column (blank units count as ``default_unit``).
+    Returns the frame with concentrations in mg/L and the ``unit`` column
+    dropped, and the sorted list of ``"analyte: unit"`` pairs that could
+    not be converted (rows for those are dropped).
+    """
+    if "unit" not in readings:
+        return readings, []
+
+    factors = unit_factors(readings["analyte"], readings["unit"], default_unit)
+    known = ~np.isnan(factors)
+    unknown = readings.loc[~known, ["analyte", "unit"]].astype(str).drop_duplicates()
+    unknown = sorted(f"{analyte}: {unit}" for analyte, unit in unknown.itertuples(index=False))
+
+    # Converted values stay float64 so readings at a threshold classify exactly
+    concentration = readings["concentration"].to_numpy(dtype=np.float64)
+    normalized = readings.loc[known].drop(columns="unit")
+    normalized["concentration"] = concentration[known] * factors[known]
+    return normalized, unknown